@@ -1,11 +1,18 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
+import math
 import os
-from src.transformers import CustomTransformer
-from src.vin_utils import get_vin_data
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from src.features import VIN_COLS, FEATURES_ORDER
+from src.vin_cache import VinCache
+from src.instrumentation import instrumentation, profiler, stage
+from src.serving import model_artifact, model_warmer
+
+# pandas, numpy, sklearn, joblib and the prediction modules are imported by the warm-up thread,
+# not here, so the first page is drawn while the model is still loading (python -m src.warmup measures both)
 
 st.title("Узнайте за сколько вы можете продать свой BMW :)")
 
@@ -16,45 +23,47 @@ st.write("""
          основываясь на характеристиках.
 """)
 
-VIN_COLS = ['EngineCylinders', 'DisplacementL', 'DisplacementCI', 'DisplacementCC',
-       'FuelTypePrimary', 'GVWR', 'EngineHP', 'Doors', 'BodyClass', 'Model',
-       'PlantCountry', 'PlantCity', 'VIN',
-       'Manufacturer', 'VehicleType']
-
-FEATURES_ORDER = [
-    "Vin", "Year", "Mileage", "City", "State",
-    "Make", "Model", "NumOfYears", "EngineCylinders", "DisplacementL",
-    "DisplacementCI", "DisplacementCC", "FuelTypePrimary", "GVWR",
-    "EngineHP", "Doors", "BodyClass", "ModelVIN",
-    "PlantCountry", "PlantCity", "Manufacturer", "VehicleType"
-]
-
-COLS_TO_EXCLUDE = exclude_cols = [
-    "Doors", "is_xDrive", "DisplacementCC",
-    "DisplacementL", "DisplacementCI", "EngineHP", "Model_1", "28d", 
-    "EngineCylinders_5.0", "28i", 
-    "GVWR", "PlantCity", "Manufacturer", "VehicleType"]
+VIN_LOOKUP_TIMEOUT = 10  # seconds, same as the NHTSA request timeout
+DEBUG_PANEL = os.environ.get("BMW_DEBUG_PANEL") == "1"  # never set this on the public deployment
 
 @st.cache_resource
-def load_model():
+def load_vin_cache():
     """
-    Load the trained model from the models directory.
+    Open the VIN decode cache shared by all sessions of this process.
+    Misses are answered by the local VIN index, NHTSA is only called when the index has no match.
     """
-    model_path = os.path.join("models", "best_random_forest_v1.joblib")
-    if not os.path.exists(model_path):
-        st.error(f"Model file not found at {model_path}. Please ensure the model is saved correctly.")
-        return None
-    model = joblib.load(model_path)
-    return model
+    from src.vin_decoder import LazyVinDecoder
+
+    decoder = LazyVinDecoder()
+    # Reading and indexing vin_data.csv takes a while: do it off the page-rendering thread
+    threading.Thread(target=decoder.load, name="vin-index", daemon=True).start()
+    return VinCache(fetch=decoder.get_vin_data)
 
-model = load_model()
+@st.cache_resource
+def load_vin_executor():
+    """
+    Thread pool running VIN lookups off the script thread, shared by all sessions.
+    """
+    return ThreadPoolExecutor(max_workers=4)
 
-if model is None:
+model_path, model_mtime = model_artifact()
+if model_mtime is None:
+    st.error(f"Model file not found at {model_path}. Please ensure the model is saved correctly.")
     st.stop()
 
+# Already running when the app was started with run_app.py, started by the first session otherwise
+warmer = model_warmer(model_path, model_mtime)
+vin_cache = load_vin_cache()
+vin_executor = load_vin_executor()
+
+if warmer.state == "loading":
+    st.info("Модель загружается, предсказание будет доступно через несколько секунд.")
+elif warmer.state == "failed":
+    st.error("Не удалось загрузить модель, попробуйте позже.")
+
 
 
-input_tab, prediction_tab = st.tabs(["Характеристики", "Предсказание"])
+input_tab, prediction_tab, scenario_tab = st.tabs(["Характеристики", "Предсказание", "Сценарии"])
 
 with input_tab:
     with st.form("Введите характеристики вашей машины:"):
@@ -81,58 +90,152 @@ with input_tab:
                 "Mileage": mileage,
                 "NumOfYears": num_of_years,
                 "Model": str(bmw_model),
-                "Vin": vin,
+                "Vin": vin.strip().upper(),
                 "City": "",
                 "Make": "BMW"
             }
-        input_df = pd.DataFrame(input_data, index=[0])
-        vin_json = get_vin_data(vin.strip().upper())
 
-        if is_submitted and len(vin.strip().upper()) == 17:
-            # Create a DataFrame with the inputs
-            
-            
-            
-            vin_progress = st.progress(0, text='Считываем данные с VIN Номера...')
-            for percent in range(100):
-                time.sleep(0.02)
-                vin_progress.progress(percent+1, text="Считываем данные с VIN Номера...")
-            vin_progress.empty()
-            vin_succes_bar = st.success("Данные успешно считаны! Перейдите в раздел \"Предсказание\" для рассчета цены.")
-            time.sleep(2)
-            vin_succes_bar.empty()
-        
-        
+        # The VIN is only decoded on submit, and only when it differs from the last decoded one
+        if is_submitted and len(input_data["Vin"]) == 17:
+            if st.session_state.get("vin") != input_data["Vin"] or not st.session_state.get("vin_json"):
+                future = vin_executor.submit(vin_cache.get, input_data["Vin"])
+                vin_progress = st.progress(0, text='Считываем данные с VIN Номера...')
+                start = time.perf_counter()
+                while not future.done():
+                    # Fill the bar over the lookup timeout; it completes as soon as the lookup does
+                    elapsed = time.perf_counter() - start
+                    vin_progress.progress(min(99, int(elapsed / VIN_LOOKUP_TIMEOUT * 100)), text="Считываем данные с VIN Номера...")
+                    time.sleep(0.05)
+                vin_progress.empty()
+                try:
+                    st.session_state["vin_json"] = future.result()
+                except Exception:
+                    st.session_state["vin_json"] = {}
+                st.session_state["vin"] = input_data["Vin"]
+            if st.session_state["vin_json"].get("Results"):
+                st.success("Данные успешно считаны! Перейдите в раздел \"Предсказание\" для рассчета цены.")
+            else:
+                st.error("Не удалось считать данные с VIN Номера, попробуйте еще раз!")
 
 with prediction_tab:
     st.text("")
     predict = st.button("Рассчитать цену")
     if predict:
-        vin_df = pd.DataFrame(vin_json["Results"][0], index=["Vin Data"])
-        vin_df = vin_df[VIN_COLS]
-        vin_numeric_cols = ["EngineCylinders", "DisplacementL", "DisplacementCI", "DisplacementCC", "EngineHP", "Doors"]
-        for col in vin_numeric_cols:
-            vin_df[col] = pd.to_numeric(vin_df[col])
+        from src.fast_predict import build_row
+
         st.text("")
-        combined_df = input_df.set_index("Vin").join(vin_df.set_index("VIN"), how="inner", rsuffix="VIN").reset_index()
-        missing_features = [feat for feat in FEATURES_ORDER if feat not in combined_df.columns]
-        if missing_features:
+        try:
+            with stage("assembly"):
+                row = build_row(input_data, st.session_state["vin_json"]["Results"][0], VIN_COLS)
+        except (KeyError, IndexError, ValueError):
+            row = None
+        missing_features = [feat for feat in FEATURES_ORDER if row is not None and feat not in row]
+        if row is None:
+            st.error("Ошибка, попробуйте еще раз!")
+        elif missing_features:
             st.error(f"Не хватает следующих характеристик: {missing_features}")
         else:
-            combined_df = combined_df[FEATURES_ORDER]
             try:
-                price = model.predict(combined_df)[0]
-                min_price, max_price = round(price) - 1900, round(price) + 1900
-                with st.container(border=True):
-                    st.metric("Оптимальная цена продажи:", f"${round(price)}")
-                min_price_col, max_price_col = st.columns(2)
-                min_price_col.metric("Рекомендуемая минимальная цена продажи:", f"${min_price}", delta=str(round((min_price/price)* 100) - 100)+"%", border=True)
-                max_price_col.metric("Рекомендуемая максимальная цена продажи:", f"${max_price}", str(round((max_price/price)*100) - 100) + "%", border=True)
+                with st.spinner("Модель загружается..."):
+                    services = warmer.wait()
+                for problem in services["problems"]:
+                    st.warning(f"Модель не прошла проверку: {problem}")
+                predictor = services["predictor"]
+                interval_engine = services["interval_engine"]
+                prediction_cache = services["prediction_cache"]
+                with stage("predict"):
+                    with stage("fast_path.features"):
+                        features = predictor.features(row).copy()
+                    price, min_price, max_price = prediction_cache.get_or_compute(
+                        features, lambda: [float(v[0]) for v in interval_engine.predict_features(features)])
+                if math.isnan(price):
+                    # The VIN record lacks engine data (or the mileage is 0), the model cannot price it
+                    st.error("Недостаточно данных о машине для расчета цены.")
+                else:
+                    min_price, max_price = round(min_price), round(max_price)
+                    with st.container(border=True):
+                        st.metric("Оптимальная цена продажи:", f"${round(price)}")
+                    min_price_col, max_price_col = st.columns(2)
+                    min_price_col.metric("Рекомендуемая минимальная цена продажи:", f"${min_price}", delta=str(round((min_price/price)* 100) - 100)+"%", border=True)
+                    max_price_col.metric("Рекомендуемая максимальная цена продажи:", f"${max_price}", str(round((max_price/price)*100) - 100) + "%", border=True)
             except:
                 st.error("Ошибка, попробуйте еще раз!")
+            if warmer.ready:
+                prediction_cache = warmer.result["prediction_cache"]
+                st.caption(f"Кэш предсказаний: {prediction_cache.hit_rate():.0%} попаданий, "
+                           f"сэкономлено {prediction_cache.saved_seconds():.2f} с")
             
 
 
+with scenario_tab:
+    st.write("Как меняется цена в зависимости от пробега и возраста машины. VIN считывается один раз, "
+             "все варианты рассчитываются одним запросом к модели.")
+    # The grid starts one step above 0: the model cannot price a car with no mileage
+    mileage_range = st.slider("Пробег:", min_value=0, max_value=300000, value=(5000, 150000), step=5000,
+                              key="scenario_mileage")
+    age_range = st.slider("Сколько лет в использовании:", min_value=0, max_value=30, value=(0, 10), step=1,
+                          key="scenario_age")
+    mileage_steps = st.number_input("Точек по пробегу:", min_value=2, max_value=100, value=50, step=1)
+    if st.button("Рассчитать сценарии"):
+        import numpy as np
+
+        from src.fast_predict import build_row
+        from src.scenarios import price_grid
+
+        try:
+            row = build_row(input_data, st.session_state["vin_json"]["Results"][0], VIN_COLS)
+        except (KeyError, IndexError, ValueError):
+            row = None
+        if row is None:
+            st.error("Сначала считайте данные с VIN номера во вкладке \"Характеристики\".")
+        else:
+            try:
+                with st.spinner("Модель загружается..."):
+                    services = warmer.wait()
+                mileages = sorted({int(m) for m in
+                                   np.linspace(mileage_range[0], mileage_range[1], int(mileage_steps)).round(-2)})
+                ages = list(range(age_range[0], age_range[1] + 1))
+                start = time.perf_counter()
+                prices = price_grid(services["interval_engine"], row, mileages, ages)
+                elapsed = time.perf_counter() - start
+                # Variants the model cannot price (no mileage, missing engine data) would leave gaps in the chart
+                unpriced = int(prices["Price"].isna().sum())
+                prices = prices.dropna(subset=["Price"])
+                if prices.empty:
+                    st.error("Недостаточно данных о машине для расчета цены.")
+                else:
+                    if unpriced:
+                        st.warning(f"{unpriced} вариантов (например, с нулевым пробегом) модель не может оценить, "
+                                   "они не показаны.")
+                    surface = prices.pivot(index="Mileage", columns="NumOfYears", values="Price")
+                    surface.columns = [f"{age} лет" for age in surface.columns]
+                    st.line_chart(surface, x_label="Пробег", y_label="Цена, $")
+                    st.dataframe(prices, hide_index=True)
+                    st.caption(f"{len(prices)} вариантов рассчитано за {elapsed:.2f} с")
+            except:
+                st.error("Ошибка, попробуйте еще раз!")
+
+
+# Diagnostics panel, opened with ?debug=1; toggles take effect without a restart.
+# Its switches are process-wide, so it only exists where the operator set DEBUG_PANEL.
+if DEBUG_PANEL and st.query_params.get("debug") == "1":
+    with st.sidebar.expander("Диагностика", expanded=True):
+        if st.toggle("Замер этапов", value=instrumentation.enabled):
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+        if st.toggle("Профилировщик", value=profiler.running):
+            profiler.start()
+        else:
+            profiler.stop()
+        st.write(f"Модель: {warmer.state}", warmer.timings)
+        if warmer.error is not None:
+            st.error(repr(warmer.error))
+        st.json(instrumentation.snapshot())
+        st.download_button("Prometheus", instrumentation.to_prometheus(), file_name="metrics.prom")
+        st.download_button("Профиль (collapsed stacks)", profiler.collapsed(), file_name="profile.txt")
+
+
 
 # if input["Vin"]:
 #     fetch_button = st.sidebar.button("Fetch VIN data")
@@ -0,0 +1,147 @@
+import argparse
+import datetime
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.intervals import PriceIntervalEngine
+from src.model_metadata import latest_artifact
+from src.vin_store import VinAttributeStore
+
+LISTING_COLS = ["Vin", "Year", "Mileage", "City", "State", "Make", "Model"]
+
+_engine = None
+
+
+def load_pricing_model(model_path):
+    """
+    Loads the joblib pipeline, or the flat export when model_path is a directory.
+    """
+    if os.path.isdir(model_path):
+        from src.forest_export import load_flat_model
+        return load_flat_model(model_path)[0]
+    return joblib.load(model_path)
+
+
+def _init_worker(model_path):
+    global _engine
+    # One thread per process: the pool already spreads chunks across cores
+    _engine = PriceIntervalEngine(load_pricing_model(model_path), n_jobs=1)
+
+
+def price_chunk(features, found):
+    """
+    Prices one chunk of joined listings in the worker process.
+
+    Parameters:
+    - features: DataFrame in FEATURES_ORDER
+    - found: boolean mask of rows whose VIN attributes are known
+
+    Returns:
+    - DataFrame with Price, MinPrice and MaxPrice (NaN for rows without VIN data or with incomplete features)
+    """
+    prices = np.full((3, len(features)), np.nan)
+    if found.any():
+        # float32 matrix straight from the transformer: no dense float64 one-hot frame per chunk
+        prices[:, found] = _engine.predict_features(_engine.transformer.transform_array(features[found]))
+    prices = np.round(prices)
+    return pd.DataFrame({"Price": prices[0], "MinPrice": prices[1], "MaxPrice": prices[2]}, index=features.index)
+
+
+def read_chunks(path, chunksize):
+    """
+    Streams a CSV or Parquet listings file in chunks of about chunksize rows.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class OutputWriter:
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._header = True
+
+    def write(self, df):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def run(input_path, output_path, vin_path, model_path, chunksize=50000, workers=None, reference_year=None):
+    """
+    Prices a listings feed. Chunks are joined with the VIN table in the main process and
+    priced in a process pool; at most 2 x workers chunks are in flight, so memory stays bounded
+    whatever the size of the input. Output rows keep the input order.
+
+    Returns:
+    - dict with row, miss and timing counts
+    """
+    workers = workers or os.cpu_count() or 1
+    reference_year = reference_year or datetime.date.today().year
+    vin_store = VinAttributeStore.load(vin_path)
+
+    stats = {"rows": 0, "vin_misses": 0, "unpriced": 0}
+    start = time.perf_counter()
+    writer = OutputWriter(output_path)
+    pending = deque()
+
+    def drain(limit):
+        while len(pending) > limit:
+            listings, future = pending.popleft()
+            prices = future.result()
+            stats["unpriced"] += int(prices["Price"].isna().sum())
+            writer.write(pd.concat([listings.reset_index(drop=True), prices.reset_index(drop=True)], axis=1))
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+            for listings in read_chunks(input_path, chunksize):
+                features, found = vin_store.join(listings[LISTING_COLS], reference_year)
+                stats["rows"] += len(listings)
+                stats["vin_misses"] += int((~found).sum())
+                pending.append((listings, pool.submit(price_chunk, features, found)))
+                drain(2 * workers)
+            drain(0)
+    finally:
+        writer.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price a whole listings feed (CSV or Parquet) with the BMW model.")
+    parser.add_argument("input", help="listings file shaped like data/true_car_listings.csv")
+    parser.add_argument("output", help="output .csv or .parquet")
+    parser.add_argument("--vin-data", default=os.path.join("data", "vin_data.csv"),
+                        help="VIN attribute store or decoded VIN table (.parquet, .csv or scraper .json)")
+    parser.add_argument("--model", default=latest_artifact())
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--reference-year", type=int, default=None,
+                        help="year NumOfYears is counted from when the feed lacks that column (default: this year)")
+    args = parser.parse_args()
+
+    stats = run(args.input, args.output, args.vin_data, args.model, args.chunksize, args.workers, args.reference_year)
+    print(f"Priced {stats['rows']} listings in {stats['seconds']:.1f}s "
+          f"({stats['unpriced']} left unpriced, {stats['vin_misses']} of them without VIN data)")
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from src.features import FEATURES_ORDER
+from src.intervals import PriceIntervalEngine
+from src.model_metadata import latest_artifact, read_metadata, write_metadata
+from src.model_utils import split_pipeline
+from src.prediction_cache import model_fingerprint
+from train import DATA_PATH, TEST_SIZE, data_fingerprint, load_training_data
+
+TEACHER_PATH = latest_artifact()
+SURROGATE_PATH = os.path.splitext(TEACHER_PATH)[0] + ".surrogate.joblib"
+
+
+def latency_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def profile(model_path, X_test, y_test=None, repeat=50):
+    """
+    Size, load time, latency, mean price range width and, when y_test is given, test MAE of a
+    saved pipeline. Rows the model cannot price (non-finite features) are left out of the means.
+    """
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    load_seconds = time.perf_counter() - start
+    engine = PriceIntervalEngine(model)
+    X = engine.transformer.transform(X_test)
+    price, low, high = engine.predict_features(X)
+    priced = ~np.isnan(price)
+    return {
+        "size_mb": round(os.path.getsize(model_path) / 2 ** 20, 1),
+        "load_seconds": round(load_seconds, 3),
+        "single_row_ms": round(latency_ms(lambda: engine.predict_features(X[:1]), repeat), 3),
+        "batch_ms": round(latency_ms(lambda: engine.predict_features(X), 3), 1),
+        "mae": None if y_test is None else round(float(mean_absolute_error(y_test[priced], price[priced])), 2),
+        "range_width": round(float(np.mean(high[priced] - low[priced])), 2),
+    }, price
+
+
+def teacher_holdout(teacher_path, data_path):
+    """
+    Rows of data_path the teacher was never trained on, as recorded by train.py, or None when the
+    teacher has no such record for this exact data file (e.g. the notebook-trained v1 model).
+    """
+    meta = read_metadata(teacher_path)
+    if not meta.get("holdout_rows") or meta.get("data_fingerprint") != data_fingerprint(data_path):
+        return None
+    return meta["holdout_rows"]
+
+
+def distill(teacher_path=TEACHER_PATH, output=SURROGATE_PATH, data_path=DATA_PATH, n_estimators=40, max_depth=12,
+            min_samples_leaf=2, n_jobs=-1, random_state=42):
+    """
+    Trains a small random forest on the predictions of the production forest.
+
+    The surrogate stays a random forest, because the app derives the price range from the
+    spread of the per-tree predictions (src.intervals), which a single boosted model lacks.
+    Labels are the teacher's prices, so the small forest learns the teacher's smoothed
+    price surface rather than the noise of individual listings.
+
+    Both models are evaluated on rows neither was trained on. When train.py recorded the
+    teacher's holdout, the budget is checked against the real MAE change on it (mae_delta).
+    Otherwise only the surrogate's own holdout is unseen, and the budget is checked against
+    the mean price difference to the teacher there (fidelity_mae), an upper bound of the MAE change.
+
+    Parameters:
+    - teacher_path: production pipeline to distill
+    - output: where to save the surrogate pipeline (metadata goes next to it)
+    - data_path: joined listings and VIN data
+    - n_estimators, max_depth, min_samples_leaf: size of the surrogate forest
+
+    Returns:
+    - report dict, also written into the surrogate's metadata file
+    """
+    teacher = joblib.load(teacher_path)
+    transformer, teacher_forest = split_pipeline(teacher)
+    X_raw, y = load_training_data(data_path)
+    holdout = teacher_holdout(teacher_path, data_path)
+    if holdout is not None:
+        test = X_raw.index.isin(holdout)
+        X_train_raw, X_test_raw, y_train, y_test = X_raw[~test], X_raw[test], y[~test], y[test]
+    else:
+        X_train_raw, X_test_raw, y_train, y_test = train_test_split(X_raw, y, test_size=TEST_SIZE,
+                                                                    random_state=random_state)
+        y_test = None  # the teacher has seen these rows, its MAE on them would be in-sample
+
+    start = time.perf_counter()
+    X_train = transformer.transform(X_train_raw)
+    surrogate = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                      min_samples_leaf=min_samples_leaf, max_features=teacher_forest.max_features,
+                                      n_jobs=n_jobs, random_state=random_state)
+    surrogate.fit(X_train, teacher_forest.predict(X_train))
+    surrogate.set_params(n_jobs=None)
+    pipeline = Pipeline([("custom_transform", transformer), ("rf", surrogate)])
+    joblib.dump(pipeline, output)
+    training_seconds = time.perf_counter() - start
+
+    teacher_stats, teacher_price = profile(teacher_path, X_test_raw, y_test)
+    surrogate_stats, surrogate_price = profile(output, X_test_raw, y_test)
+    priced = ~np.isnan(teacher_price) & ~np.isnan(surrogate_price)
+    fidelity_mae = round(float(mean_absolute_error(teacher_price[priced], surrogate_price[priced])), 2)
+    mae_delta = None if y_test is None else round(surrogate_stats["mae"] - teacher_stats["mae"], 2)
+    report = {
+        "teacher": teacher_stats,
+        "surrogate": surrogate_stats,
+        "holdout": "teacher holdout" if y_test is not None else "surrogate holdout",
+        "mae_delta": mae_delta,
+        "fidelity_mae": fidelity_mae,
+        # Value load_model compares with its error budget
+        "budget_metric": "mae_delta" if mae_delta is not None else "fidelity_mae",
+        "budget_error": mae_delta if mae_delta is not None else fidelity_mae,
+    }
+    write_metadata(
+        output, pipeline, FEATURES_ORDER,
+        distilled_from=os.path.basename(teacher_path),
+        artifact_fingerprint=model_fingerprint(output),
+        training_seconds=round(training_seconds, 1),
+        trained_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        hyperparameters={"n_estimators": n_estimators, "max_depth": max_depth, "min_samples_leaf": min_samples_leaf},
+        n_estimators=n_estimators,
+        test_mae=surrogate_stats["mae"],
+        **report,
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the production forest into a small surrogate forest.")
+    parser.add_argument("--teacher", default=TEACHER_PATH)
+    parser.add_argument("--output", default=None, help="default: the teacher path with a .surrogate.joblib suffix")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--trees", type=int, default=40)
+    parser.add_argument("--max-depth", type=int, default=12)
+    parser.add_argument("--min-samples-leaf", type=int, default=2)
+    parser.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.teacher)[0] + ".surrogate.joblib"
+    report = distill(args.teacher, output, args.data, args.trees, args.max_depth, args.min_samples_leaf, args.jobs)
+    print(json.dumps(report, indent=2))
+    print(f"{report['budget_metric']} ${report['budget_error']:,.0f}; serve it with BMW_MODEL_VARIANT=surrogate "
+          f"(used while this stays within BMW_MAE_BUDGET)")
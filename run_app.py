@@ -0,0 +1,18 @@
+import sys
+
+from streamlit.web import cli
+
+from src.serving import model_artifact, model_warmer
+
+# `streamlit run app.py` only executes the script when a browser session connects, so the model
+# would load (and BMW_READY_FILE appear) only after the first visitor. This launcher starts the
+# warm-up in the server process first, then hands over to Streamlit; app.py picks up the running warmer.
+# Usage: python run_app.py [streamlit run options, e.g. --server.port 8501]
+
+if __name__ == "__main__":
+    model_path, model_mtime = model_artifact()
+    if model_mtime is None:
+        sys.exit(f"Model file not found at {model_path}")
+    model_warmer(model_path, model_mtime)
+    sys.argv = ["streamlit", "run", "app.py", *sys.argv[1:]]
+    sys.exit(cli.main())
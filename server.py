@@ -0,0 +1,318 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.features import VIN_COLS, FEATURES_ORDER
+from src.fast_predict import build_row
+from src.intervals import PriceIntervalEngine
+from src.instrumentation import instrumentation, profiler
+from src.model_metadata import latest_artifact
+from src.scenarios import price_grid
+from src.warmup import WARMUP_VIN_RESULT
+
+# Decoded record returned by the stub VIN source used for local load tests
+STUB_VIN_RESULT = WARMUP_VIN_RESULT
+
+
+def stub_vin_source(vin):
+    return {"Count": 1, "Results": [dict(STUB_VIN_RESULT, VIN=vin)]}
+
+
+class Metrics:
+    def __init__(self, window=10000):
+        """
+        Request counters and a rolling window of latencies.
+        """
+        self.started = time.time()
+        self.counters = {"requests": 0, "errors": 0, "predictions": 0, "batches": 0}
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["predictions"] += size
+            self.batch_sizes.append(size)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            counters = dict(self.counters)
+        uptime = time.time() - self.started
+        snapshot = dict(counters, uptime_seconds=uptime, requests_per_second=counters["requests"] / uptime)
+        if len(latencies):
+            snapshot.update({f"latency_p{q}_ms": float(np.percentile(latencies, q)) for q in (50, 90, 99)})
+        if len(batch_sizes):
+            snapshot["mean_batch_size"] = float(batch_sizes.mean())
+        return snapshot
+
+
+class MicroBatcher:
+    def __init__(self, model, metrics, max_batch=64, max_wait=0.005):
+        """
+        Coalesces concurrent single-car requests into one forest evaluation.
+
+        Parameters:
+        - model: fitted pipeline taking a DataFrame in FEATURES_ORDER
+        - metrics: Metrics instance
+        - max_batch: largest batch sent to the model
+        - max_wait: seconds the first request of a batch waits for company
+        """
+        self.engine = PriceIntervalEngine(model)
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, row):
+        """
+        Queues one feature row and returns a Future resolving to its (price, min, max).
+        """
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def predict_rows(self, rows):
+        price, low, high = self.engine.predict(pd.DataFrame(rows)[FEATURES_ORDER])
+        self.metrics.observe_batch(len(rows))
+        return list(zip(price, low, high))
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            rows, futures = zip(*batch)
+            try:
+                prices = self.predict_rows(list(rows))
+            except Exception:
+                # One bad row must not fail the requests it was batched with: retry them one by one
+                self._predict_each(rows, futures)
+                continue
+            for future, price in zip(futures, prices):
+                future.set_result(price)
+
+    def _predict_each(self, rows, futures):
+        for row, future in zip(rows, futures):
+            try:
+                future.set_result(self.predict_rows([row])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+
+class PricingService:
+    def __init__(self, model, vin_source, max_batch=64, max_wait=0.005):
+        self.vin_source = vin_source
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(model, self.metrics, max_batch, max_wait)
+
+    def make_row(self, car):
+        """
+        Builds a FEATURES_ORDER row from a request body like
+        {"Vin": ..., "Year": 2016, "Mileage": 20000, "NumOfYears": 5, "Model": "3"}.
+        """
+        vin = str(car["Vin"]).strip().upper()
+        input_data = {
+            "Year": int(car["Year"]),
+            "State": str(car.get("State", "")),
+            "Mileage": float(car["Mileage"]),
+            "NumOfYears": int(car["NumOfYears"]),
+            "Model": str(car["Model"]),
+            "Vin": vin,
+            "City": str(car.get("City", "")),
+            "Make": "BMW"
+        }
+        return build_row(input_data, self.vin_source(vin)["Results"][0], VIN_COLS)
+
+    @staticmethod
+    def price_response(prices):
+        if np.isnan(prices[0]):
+            raise ValueError("incomplete vehicle data, the car cannot be priced")
+        price, low, high = (round(float(p)) for p in prices)
+        return {"price": price, "min_price": low, "max_price": high}
+
+    def predict(self, car):
+        return self.price_response(self.batcher.submit(self.make_row(car)).result())
+
+    def predict_batch(self, cars):
+        """
+        Prices a list of cars in one pass. Every car gets its own entry: a price, or an error when
+        its input or VIN record is unusable or the model cannot price it.
+        """
+        results, rows = [], []
+        for car in cars:
+            try:
+                rows.append(self.make_row(car))
+                results.append(None)
+            except (KeyError, IndexError, ValueError, TypeError) as e:
+                results.append({"error": str(e)})
+        prices = iter(self.batcher.predict_rows(rows) if rows else [])
+        for i, result in enumerate(results):
+            if result is None:
+                price = next(prices)
+                results[i] = {"error": "incomplete vehicle data"} if np.isnan(price[0]) else self.price_response(price)
+        return results
+
+    def predict_grid(self, body):
+        """
+        Prices one car over every combination of body["mileages"] and body["ages"] in one batch.
+        """
+        grid = price_grid(self.batcher.engine, self.make_row(body["car"]), body["mileages"], body["ages"],
+                          body.get("years"))
+        return grid.to_dict(orient="records")
+
+
+def make_handler(service, debug=False):
+    """
+    Request handler of the pricing API. The /debug endpoints switch process-wide instrumentation
+    and the profiler, so they answer 404 unless debug is set (--debug-endpoints).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            payload = (json.dumps(body) if content_type == "application/json" else body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, dict(service.metrics.snapshot(), stages=instrumentation.snapshot()))
+            elif self.path == "/metrics/prometheus":
+                self._send(200, instrumentation.to_prometheus(), "text/plain; version=0.0.4")
+            elif self.path == "/debug/profile" and debug:
+                self._send(200, profiler.collapsed(), "text/plain")
+            elif self.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            service.metrics.incr("requests")
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/predict":
+                    result = service.predict(body)
+                elif self.path == "/predict/batch":
+                    result = service.predict_batch(body["cars"])
+                elif self.path == "/predict/grid":
+                    result = service.predict_grid(body)
+                elif self.path == "/debug/instrumentation" and debug:
+                    if body.get("enabled"):
+                        instrumentation.enable()
+                    else:
+                        instrumentation.disable()
+                    result = {"enabled": instrumentation.enabled}
+                elif self.path == "/debug/profile" and debug:
+                    if body.get("enabled"):
+                        profiler.start()
+                    else:
+                        profiler.stop()
+                    result = {"enabled": profiler.running}
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+            except (KeyError, IndexError, ValueError, TypeError) as e:
+                service.metrics.incr("errors")
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                service.metrics.incr("errors")
+                self._send(500, {"error": str(e)})
+                return
+            service.metrics.observe(time.perf_counter() - start)
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def load_test(url, n_requests=1000, concurrency=32, car=None):
+    """
+    Fires n_requests single-car predictions at a running server from concurrency threads.
+
+    Returns:
+    - dict with throughput and latency percentiles in ms
+    """
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    car = car or {"Vin": "WBA8E9G59GNT12345", "Year": 2016, "Mileage": 30000, "NumOfYears": 5, "Model": "3"}
+    payload = json.dumps(car).encode()
+
+    def call(_):
+        start = time.perf_counter()
+        request = urllib.request.Request(f"{url}/predict", data=payload, headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request).read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = np.array(list(pool.map(call, range(n_requests)))) * 1000
+    elapsed = time.perf_counter() - start
+    return {"requests_per_second": n_requests / elapsed,
+            **{f"latency_p{q}_ms": float(np.percentile(latencies, q)) for q in (50, 90, 99)}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON pricing API with request micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=latest_artifact())
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--stub-vin", action="store_true", help="answer every VIN with a fixed record (load tests)")
+    parser.add_argument("--load-test", type=int, default=0, metavar="N",
+                        help="start the server, send N requests to it and print the results")
+    parser.add_argument("--debug-endpoints", action="store_true",
+                        help="enable the /debug endpoints that toggle instrumentation and the profiler")
+    args = parser.parse_args()
+
+    if args.stub_vin:
+        vin_source = stub_vin_source
+    else:
+        from src.vin_cache import VinCache
+        from src.vin_decoder import vin_fetcher
+        vin_source = VinCache(fetch=vin_fetcher()).get
+
+    service = PricingService(joblib.load(args.model), vin_source, args.max_batch, args.max_wait_ms / 1000)
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.debug_endpoints))
+    print(f"Serving on http://{args.host}:{args.port}")
+    if args.load_test:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        print(load_test(f"http://{args.host}:{args.port}", args.load_test))
+        print(service.metrics.snapshot())
+        httpd.shutdown()
+    else:
+        httpd.serve_forever()
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.fast_predict import SingleRowPredictor, build_row
+from src.features import VIN_COLS, FEATURES_ORDER, VIN_NUMERIC_COLS
+from src.intervals import PriceIntervalEngine
+from src.model_metadata import latest_artifact
+from src.model_utils import find_custom_transformer
+from src.vin_cache import VinCache
+
+MODEL_PATH = latest_artifact()
+
+
+def synthetic_listings(transformer, n_rows, seed=0):
+    """
+    Generates n_rows of model input in FEATURES_ORDER. Categorical values are drawn from the
+    categories the fitted transformer knows, so the synthetic rows exercise the real encodings.
+    """
+    rng = np.random.default_rng(seed)
+    categories = dict(zip(transformer.ohe_columns, transformer.ohe.categories_))
+    models = [model for models in transformer.series_map.values() for model in models]
+    states = [s for group in transformer.economic_categories for s in group["state_abbreviations"]] + ["ON"]
+
+    def pick(values):
+        values = [v for v in values if not (isinstance(v, float) and np.isnan(v)) and v is not None]
+        return np.asarray(values, dtype=object)[rng.integers(0, len(values), n_rows)]
+
+    year = rng.integers(1998, 2018, n_rows)
+    cylinders = pick(categories["EngineCylinders"]).astype(float)
+    displacement = np.round(rng.uniform(1.5, 6.6, n_rows), 1)
+    df = pd.DataFrame({
+        "Vin": [f"WBA{i:014d}" for i in range(n_rows)],
+        "Year": year,
+        # Mileage 0 has no log, the transformer would turn it into NaN, which the forest rejects
+        "Mileage": rng.integers(1, 250000, n_rows),
+        "City": "",
+        "State": pick(states),
+        "Make": "BMW",
+        "Model": pick(models),
+        "NumOfYears": 2018 - year,
+        "EngineCylinders": cylinders,
+        "DisplacementL": displacement,
+        "DisplacementCI": displacement * 61.0237,
+        "DisplacementCC": displacement * 1000,
+        "FuelTypePrimary": pick(categories["FuelTypePrimary"]),
+        "GVWR": "",
+        "EngineHP": rng.integers(130, 600, n_rows).astype(float),
+        "Doors": rng.choice([2.0, 4.0], n_rows),
+        "BodyClass": pick(transformer.bodyclass_map.keys()),
+        "ModelVIN": "",
+        "PlantCountry": pick(categories["PlantCountry"]),
+        "PlantCity": "",
+        "Manufacturer": "BMW",
+        "VehicleType": "PASSENGER CAR",
+    })
+    return df[FEATURES_ORDER]
+
+
+def stub_vin_result(row):
+    """
+    Decoded VIN record, as NHTSA would return it (all strings), for one synthetic row.
+    """
+    result = {col: "" if pd.isna(row.get(col)) else str(row.get(col)) for col in VIN_COLS}
+    result["VIN"] = row["Vin"]
+    result["Model"] = row["ModelVIN"]
+    return result
+
+
+def timed(func, repeat):
+    """
+    Runs func repeat times and returns the per-call latencies in seconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def summary(name, latencies, rows=1, **extra):
+    result = {
+        "name": name,
+        "rows": rows,
+        "calls": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "rows_per_second": float(rows / np.median(latencies)),
+    }
+    result.update(extra)
+    print(f"{name:<32} rows={rows:<9} p50={result['p50_ms']:10.3f} ms  p99={result['p99_ms']:10.3f} ms  "
+          f"{result['rows_per_second']:14,.0f} rows/s")
+    return result
+
+
+def peak_memory_mb(func):
+    """
+    Peak Python/NumPy heap allocated while func runs, in MB.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def cold_load(model_path):
+    """
+    Loads the model in a fresh interpreter, so no import or page cache of this process helps.
+    """
+    code = ("import time, joblib, sys; sys.path.insert(0, '.'); start = time.perf_counter(); "
+            f"joblib.load({model_path!r}); print(time.perf_counter() - start)")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip()), time.perf_counter() - start
+
+
+def run(model_path=MODEL_PATH, batch_sizes=(1000, 100000, 1000000), repeat=200, skip_cold=False):
+    model = joblib.load(model_path)
+    transformer = find_custom_transformer(model)
+    results = []
+
+    # Single-row latency, stage by stage
+    row_df = synthetic_listings(transformer, 1, seed=1)
+    row = row_df.iloc[0].to_dict()
+    vin_result = stub_vin_result(row)
+    vin_cache = VinCache(":memory:", fetch=lambda vin: {"Count": 1, "Results": [vin_result]})
+
+    def vin_decode_miss():
+        vin_cache._memory.clear()
+        vin_cache._conn.execute("DELETE FROM vin_cache")
+        return vin_cache.get(row["Vin"])
+
+    results.append(summary("vin_decode_miss", timed(vin_decode_miss, repeat)))
+    results.append(summary("vin_decode_hit", timed(lambda: vin_cache.get(row["Vin"]), repeat)))
+
+    input_data = {k: row[k] for k in ["Year", "State", "Mileage", "NumOfYears", "Model", "Vin", "City", "Make"]}
+
+    def dataframe_assembly():
+        input_df = pd.DataFrame(input_data, index=[0])
+        vin_df = pd.DataFrame(vin_result, index=["Vin Data"])[VIN_COLS]
+        for col in VIN_NUMERIC_COLS:
+            vin_df[col] = pd.to_numeric(vin_df[col])
+        combined = input_df.set_index("Vin").join(vin_df.set_index("VIN"), how="inner", rsuffix="VIN").reset_index()
+        return combined[FEATURES_ORDER]
+
+    results.append(summary("assembly_dataframe_join", timed(dataframe_assembly, repeat)))
+    results.append(summary("assembly_build_row", timed(lambda: build_row(input_data, vin_result, VIN_COLS), repeat)))
+
+    combined = dataframe_assembly()
+    X_row = transformer.transform(combined)
+    forest = model.steps[-1][1]
+    results.append(summary("transform_single", timed(lambda: transformer.transform(combined), repeat)))
+    results.append(summary("forest_predict_single", timed(lambda: forest.predict(X_row), repeat)))
+    results.append(summary("pipeline_predict_single", timed(lambda: model.predict(combined), repeat)))
+
+    predictor = SingleRowPredictor(model, FEATURES_ORDER)
+    fast_row = build_row(input_data, vin_result, VIN_COLS)
+    results.append(summary("fast_path_predict_single", timed(lambda: predictor.predict(fast_row), repeat)))
+    engine = PriceIntervalEngine(model)
+    x = predictor.features(fast_row).copy()
+    results.append(summary("interval_predict_single", timed(lambda: engine.predict_features(x), repeat)))
+
+    # Batch throughput and peak memory
+    for n_rows in batch_sizes:
+        batch = synthetic_listings(transformer, n_rows, seed=n_rows)
+        calls = 3 if n_rows <= 100000 else 1
+        transform_latencies = timed(lambda: transformer.transform(batch), calls)
+        X = transformer.transform(batch)
+        results.append(summary(f"transform_batch_{n_rows}", transform_latencies, n_rows))
+        results.append(summary(f"predict_batch_{n_rows}", timed(lambda: forest.predict(X), calls), n_rows))
+        results.append(summary(f"pipeline_batch_{n_rows}", timed(lambda: model.predict(batch), calls), n_rows,
+                               peak_memory_mb=peak_memory_mb(lambda: model.predict(batch))))
+        del batch, X
+
+    if not skip_cold:
+        load_seconds, process_seconds = cold_load(model_path)
+        results.append({"name": "cold_model_load", "load_seconds": load_seconds, "process_seconds": process_seconds})
+        print(f"{'cold_model_load':<32} load={load_seconds:.3f} s  process={process_seconds:.3f} s")
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Prints the p50 ratio of every scenario against a previous results file (>1 means slower).
+    """
+    with open(baseline_path) as file:
+        baseline = {r["name"]: r for r in json.load(file)["results"]}
+    for result in results:
+        old = baseline.get(result["name"])
+        if old and "p50_ms" in result and old.get("p50_ms"):
+            ratio = result["p50_ms"] / old["p50_ms"]
+            flag = "  REGRESSION" if ratio > 1.1 else ""
+            print(f"{result['name']:<32} {old['p50_ms']:10.3f} -> {result['p50_ms']:10.3f} ms ({ratio:.2f}x){flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the prediction pipeline.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[1000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per single-row scenario")
+    parser.add_argument("--skip-cold", action="store_true", help="skip the cold model load scenario")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="previous results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.model, args.batch_sizes, args.repeat, args.skip_cold)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,177 @@
+import math
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.features import VIN_NUMERIC_COLS
+from src.instrumentation import stage
+from src.model_utils import split_pipeline
+from src.transformers import CustomTransformer, MODEL_PATTERNS
+
+
+class SingleRowPredictor:
+    def __init__(self, model, features_order):
+        """
+        Compiles the fitted pipeline into a feature-index plan for one-car predictions.
+        A dict goes in, a float comes out, without building any DataFrame.
+
+        Parameters:
+        - model: fitted Pipeline(CustomTransformer, regressor)
+        - features_order: input column order expected by the pipeline (FEATURES_ORDER in app.py)
+        """
+        transformer, estimator = split_pipeline(model)
+        if not isinstance(transformer, CustomTransformer):
+            raise ValueError("SingleRowPredictor expects a Pipeline of CustomTransformer and a regressor.")
+        self.model = model
+        self.transformer = transformer
+        self.estimator = estimator
+        self.features_order = list(features_order)
+
+        # The final column order is fixed by the input columns, so one dummy transform reveals it
+        template = {col: 1.0 for col in self.features_order}
+        template.update({col: "" for col in ["Vin", "City", "State", "Make", "ModelVIN", "FuelTypePrimary",
+                                             "BodyClass", "PlantCountry", "PlantCity", "GVWR",
+                                             "Manufacturer", "VehicleType"] if col in template})
+        template["Model"] = "3"
+        self.feature_names = list(transformer.transform(pd.DataFrame(template, index=[0])[self.features_order]).columns)
+        position = {name: i for i, name in enumerate(self.feature_names)}
+
+        # One-hot blocks: (input column, {category: output position}, position of the missing-value category)
+        self._ohe_plan = []
+        all_ohe_names = iter(transformer.ohe.get_feature_names_out(transformer.ohe_columns))
+        ohe_names = set()
+        for col, categories in zip(transformer.ohe_columns, transformer.ohe.categories_):
+            lookup, nan_position = {}, None
+            for category in categories:
+                name = next(all_ohe_names)
+                ohe_names.add(name)
+                if name not in position:
+                    continue  # dropped after encoding
+                # Missing values are a None category in object columns and NaN in numeric ones
+                if category is None or (isinstance(category, float) and math.isnan(category)):
+                    nan_position = position[name]
+                else:
+                    lookup[category] = position[name]
+            self._ohe_plan.append((col, lookup, nan_position))
+
+        # Every other output column is read by name from the engineered row
+        self._scalar_plan = [(name, i) for i, name in enumerate(self.feature_names) if name not in ohe_names]
+        self._local = threading.local()  # one preallocated vector per Streamlit session thread
+
+    def features(self, row):
+        """
+        Fills the preallocated feature vector for one car.
+
+        Parameters:
+        - row: dict with the keys of features_order; VIN numeric fields already parsed to numbers
+
+        Returns:
+        - ndarray of shape (1, n_features), reused between calls on the same thread
+        """
+        t = self.transformer
+        values = dict(row)
+
+        mileage = float(values["Mileage"])
+        num_years = float(values.get("NumOfYears", 0))
+        per_year = mileage / num_years if num_years != 0 else mileage
+        # np.log over an array keeps the exact ufunc loop used by the DataFrame path
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(np.array([mileage, per_year]))
+        values["Mileage"] = logs[0] if mileage != 0 and not math.isinf(logs[0]) else np.nan
+        values["Mileage_per_year"] = logs[1] if per_year != 0 and not math.isinf(logs[1]) else np.nan
+
+        values["Region"] = t.gdp_map[t._get_region(values["State"])]
+        hp, cylinders, displacement = (float(values[c]) for c in ("EngineHP", "EngineCylinders", "DisplacementL"))
+        values["Power_perCylinder"] = _divide(hp, cylinders)
+        values["Power_perDisplacement"] = _divide(hp, displacement)
+        values["CylinderSize"] = _divide(displacement, cylinders)
+        values["TotalPowerOutput"] = hp * cylinders
+        values["TotalPowerCapacity"] = displacement * cylinders
+
+        model_name = values["Model"]
+        for new_col, pattern in MODEL_PATTERNS.items():
+            values[new_col] = int(pattern in model_name)
+        values["BodyClass"] = t.bodyclass_map.get(values["BodyClass"], np.nan)
+        values["Model"] = t._get_series(model_name)
+
+        x = getattr(self._local, "buffer", None)
+        if x is None:
+            x = self._local.buffer = np.zeros((1, len(self.feature_names)), dtype=np.float64)
+        x.fill(0.0)
+        for name, i in self._scalar_plan:
+            x[0, i] = values[name]
+        for col, lookup, nan_position in self._ohe_plan:
+            value = values[col]
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                i = nan_position
+            else:
+                i = lookup.get(value)
+            if i is not None:
+                x[0, i] = 1.0
+        return x
+
+    def predict(self, row):
+        """
+        Predicts the price of one car.
+
+        Parameters:
+        - row: dict with the keys of features_order
+
+        Returns:
+        - predicted price as float
+        """
+        with stage("fast_path.features"):
+            x = self.features(row)
+        return self.predict_features(x)
+
+    def predict_features(self, x):
+        """
+        Predicts from a feature vector produced by features().
+        """
+        with warnings.catch_warnings():
+            # The regressor was fitted on a DataFrame; the plan guarantees the same column order
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return float(self.estimator.predict(x)[0])
+
+    def check(self, row):
+        """
+        Returns True if the fast path reproduces model.predict on the DataFrame path for this row.
+        """
+        expected = self.model.predict(pd.DataFrame(row, index=[0])[self.features_order])[0]
+        return self.predict(row) == expected
+
+
+def _divide(a, b):
+    # Follows pandas semantics: x / 0 -> +-inf, 0 / 0 -> nan
+    if b != 0:
+        return a / b
+    if a == 0 or math.isnan(a):
+        return np.nan
+    return math.copysign(np.inf, a) * math.copysign(1.0, b)
+
+
+def build_row(input_data, vin_result, vin_cols):
+    """
+    Merges the form inputs with one decoded VIN record, mirroring the DataFrame join in app.py.
+
+    Parameters:
+    - input_data: dict of form inputs including "Vin"
+    - vin_result: one entry of the decoded "Results" list
+    - vin_cols: VIN fields used by the model
+
+    Returns:
+    - dict keyed like FEATURES_ORDER (the VIN "Model" becomes "ModelVIN")
+    """
+    if str(vin_result.get("VIN", "")) != str(input_data["Vin"]):
+        raise KeyError(f"Decoded VIN {vin_result.get('VIN')!r} does not match {input_data['Vin']!r}")
+    row = dict(input_data)
+    for col in vin_cols:
+        if col == "VIN":
+            continue
+        value = vin_result.get(col)
+        if col in VIN_NUMERIC_COLS:
+            value = float(value) if value not in (None, "") else np.nan
+        row["ModelVIN" if col in input_data else col] = value
+    return row
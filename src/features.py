@@ -0,0 +1,61 @@
+VIN_COLS = ['EngineCylinders', 'DisplacementL', 'DisplacementCI', 'DisplacementCC',
+       'FuelTypePrimary', 'GVWR', 'EngineHP', 'Doors', 'BodyClass', 'Model',
+       'PlantCountry', 'PlantCity', 'VIN',
+       'Manufacturer', 'VehicleType']
+
+VIN_NUMERIC_COLS = ["EngineCylinders", "DisplacementL", "DisplacementCI", "DisplacementCC", "EngineHP", "Doors"]
+
+FEATURES_ORDER = [
+    "Vin", "Year", "Mileage", "City", "State",
+    "Make", "Model", "NumOfYears", "EngineCylinders", "DisplacementL",
+    "DisplacementCI", "DisplacementCC", "FuelTypePrimary", "GVWR",
+    "EngineHP", "Doors", "BodyClass", "ModelVIN",
+    "PlantCountry", "PlantCity", "Manufacturer", "VehicleType"
+]
+
+COLS_TO_EXCLUDE = [
+    "Doors", "is_xDrive", "DisplacementCC",
+    "DisplacementL", "DisplacementCI", "EngineHP", "Model_1", "28d",
+    "EngineCylinders_5.0", "28i",
+    "GVWR", "PlantCity", "Manufacturer", "VehicleType"]
+
+
+def prepare_vin_table(vin_df):
+    """
+    Brings a decoded VIN table into join shape: VIN_COLS only, numeric engine columns
+    parsed, indexed by the normalized VIN, "Model" renamed to "ModelVIN".
+    """
+    import pandas as pd
+
+    vin_df = vin_df[VIN_COLS].copy()
+    for col in VIN_NUMERIC_COLS:
+        vin_df[col] = pd.to_numeric(vin_df[col], errors="coerce")
+    vin_df["VIN"] = vin_df["VIN"].astype(str).str.strip().str.upper()
+    vin_df = vin_df.drop_duplicates("VIN").set_index("VIN")
+    return vin_df.rename(columns={"Model": "ModelVIN"})
+
+
+def join_vin_attributes(listings, vin_table, reference_year=None):
+    """
+    Enriches listings (Vin, Year, Mileage, City, State, Make, Model) with VIN attributes
+    in one vectorized merge and returns them in FEATURES_ORDER.
+
+    Parameters:
+    - listings: pandas DataFrame shaped like data/true_car_listings.csv
+    - vin_table: output of prepare_vin_table
+    - reference_year: year NumOfYears is counted from when listings lack that column
+
+    Returns:
+    - (features DataFrame in FEATURES_ORDER, boolean mask of listings whose VIN was found)
+    """
+    listings = listings.copy()
+    listings["Vin"] = listings["Vin"].astype(str).str.strip().str.upper()
+    listings["Model"] = listings["Model"].astype(str)
+    if "NumOfYears" not in listings.columns:
+        listings["NumOfYears"] = (reference_year - listings["Year"]).clip(lower=0)
+    for col in ["City", "State", "Make"]:
+        if col not in listings.columns:
+            listings[col] = ""
+    joined = listings.join(vin_table, on="Vin", how="left")
+    found = listings["Vin"].isin(vin_table.index).to_numpy()
+    return joined[FEATURES_ORDER], found
@@ -0,0 +1,126 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.forest_export import FlatForestRegressor, flatten_forest
+from src.model_metadata import latest_artifact
+
+
+class ForestEvaluator:
+    def __init__(self, forest, chunk_size=8192, tree_block=32, n_jobs=None):
+        """
+        Batched evaluator for a FlatForestRegressor.
+
+        Rows are processed in chunks and trees in blocks, so the working set (one chunk of
+        inputs plus a chunk_size x tree_block node matrix) stays in cache. Chunks are scored
+        on a thread pool; NumPy releases the GIL inside the gather and compare kernels.
+
+        Parameters:
+        - forest: FlatForestRegressor, or a fitted RandomForestRegressor (flattened on the fly)
+        - chunk_size: rows per work item
+        - tree_block: trees advanced together
+        - n_jobs: worker threads (None uses all cores, 1 disables threading)
+        """
+        if not isinstance(forest, FlatForestRegressor):
+            arrays = flatten_forest(forest)
+            forest = FlatForestRegressor(max_depth=arrays.pop("max_depth"), **arrays)
+        self.forest = forest
+        self.chunk_size = chunk_size
+        self.tree_block = tree_block
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+
+    def _predict_chunk(self, X, per_tree=False):
+        f = self.forest
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        out = np.empty((n_rows, f.n_estimators), dtype=f.value.dtype) if per_tree else np.zeros(n_rows)
+
+        for start in range(0, f.n_estimators, self.tree_block):
+            roots = np.asarray(f.roots[start:start + self.tree_block])
+            nodes = np.broadcast_to(roots, (n_rows, len(roots))).copy()
+            for depth in range(f.max_depth):
+                go_left = flat_X[row_offsets + f.feature[nodes]] <= f.threshold[nodes]
+                nodes = np.where(go_left, f.children_left[nodes], f.children_right[nodes])
+                # Leaves point to themselves; stop once every row sits in a leaf
+                if depth % 8 == 7 and (f.children_left[nodes] == nodes).all():
+                    break
+            leaf_values = f.value[nodes]
+            if per_tree:
+                out[:, start:start + len(roots)] = leaf_values
+            else:
+                out += leaf_values.sum(axis=1, dtype=np.float64)
+        return out
+
+    def _map_chunks(self, X, per_tree):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        chunks = [X[i:i + self.chunk_size] for i in range(0, X.shape[0], self.chunk_size)]
+        if self.n_jobs == 1 or len(chunks) <= 1:
+            results = [self._predict_chunk(chunk, per_tree) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(self.n_jobs) as pool:
+                results = list(pool.map(lambda chunk: self._predict_chunk(chunk, per_tree), chunks))
+        if not results:
+            return np.empty((0, self.forest.n_estimators)) if per_tree else np.empty(0)
+        return np.concatenate(results)
+
+    def predict(self, X):
+        """
+        Mean prediction over all trees, shape (n_rows,).
+        """
+        return self._map_chunks(X, per_tree=False) / self.forest.n_estimators
+
+    def predict_all(self, X):
+        """
+        Prediction of every tree, shape (n_rows, n_trees).
+        """
+        return self._map_chunks(X, per_tree=True)
+
+    def predict_stream(self, batches):
+        """
+        Throughput mode: scores an iterable of feature matrices (e.g. chunks of a file
+        with millions of rows) and yields one prediction array per input batch.
+        """
+        for X in batches:
+            yield self.predict(X)
+
+    def verify(self, reference, X, rtol=1e-7, atol=1e-6):
+        """
+        Checks that the evaluator reproduces reference.predict (the sklearn forest) on X.
+
+        Returns:
+        - maximum absolute difference
+
+        Raises:
+        - AssertionError if any prediction differs beyond the tolerance
+        """
+        expected = reference.predict(X)
+        actual = self.predict(np.asarray(X))
+        np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol)
+        return float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure flat forest throughput against sklearn.")
+    parser.add_argument("--model", default=latest_artifact())
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    import joblib
+    from src.model_utils import split_pipeline
+
+    _, forest = split_pipeline(joblib.load(args.model))
+    evaluator = ForestEvaluator(forest, n_jobs=args.jobs)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.rows, forest.n_features_in_)).astype(np.float32)
+
+    print(f"Max abs difference vs sklearn on 10k rows: {evaluator.verify(forest, X[:10000]):.3g}")
+    for name, func in [("flat evaluator", evaluator.predict), ("sklearn", forest.predict)]:
+        start = time.perf_counter()
+        func(X)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {args.rows / elapsed:,.0f} rows/s")
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import resource
+import time
+
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+from src.model_metadata import latest_artifact
+from src.model_utils import split_pipeline
+
+
+FLAT_ARRAYS = ["feature", "threshold", "children_left", "children_right", "value", "roots"]
+
+
+class FlatForestRegressor:
+    def __init__(self, feature, threshold, children_left, children_right, value, roots, max_depth,
+                 feature_names_in_=None):
+        """
+        Random forest stored as contiguous node arrays shared by all trees.
+
+        Node i of the forest tests X[:, feature[i]] <= threshold[i] and moves to children_left[i]
+        or children_right[i]. Leaves point to themselves, so every row can be advanced max_depth
+        times without checking whether it already reached a leaf.
+
+        Parameters:
+        - feature, threshold, children_left, children_right, value: per-node arrays (may be memory-mapped)
+        - roots: index of the root node of every tree
+        - max_depth: depth of the deepest tree
+        - feature_names_in_: column names the forest was trained on
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.feature_names_in_ = feature_names_in_
+        self.n_estimators = len(roots)
+
+    def apply(self, X):
+        """
+        Returns the leaf reached by every row in every tree, shape (n_rows, n_trees).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def predict_all(self, X):
+        """
+        Returns the prediction of every tree, shape (n_rows, n_trees).
+        """
+        return self.value[self.apply(X)]
+
+    def predict(self, X):
+        return self.predict_all(X).astype(np.float64).mean(axis=1)
+
+
+def flatten_forest(forest, float32=False):
+    """
+    Converts a fitted RandomForestRegressor into the arrays of a FlatForestRegressor.
+
+    Parameters:
+    - forest: fitted sklearn RandomForestRegressor (single output)
+    - float32: store leaf values as float32. Thresholds are always stored as float32,
+      rounded down, which keeps splits exact because sklearn compares float32 inputs.
+
+    Returns:
+    - dict of arrays plus max_depth
+    """
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(offset, offset + n)
+
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        value.append(tree.value[:, 0, 0])
+        roots.append(offset)
+
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    threshold = np.concatenate(threshold)
+    threshold32 = threshold.astype(np.float32)
+    too_high = threshold32.astype(np.float64) > threshold
+    threshold32[too_high] = np.nextafter(threshold32[too_high], np.float32(-np.inf))
+
+    index_dtype = np.int32 if offset < 2 ** 31 else np.int64
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": threshold32,
+        "children_left": np.concatenate(left).astype(index_dtype),
+        "children_right": np.concatenate(right).astype(index_dtype),
+        "value": np.concatenate(value).astype(np.float32 if float32 else np.float64),
+        "roots": np.asarray(roots, dtype=index_dtype),
+        "max_depth": max_depth,
+    }
+
+
+def export_model(model, out_dir, float32=False):
+    """
+    Writes the pipeline as a directory of .npy node arrays, the pickled feature transformer
+    and a meta.json. Only the fields needed for prediction are kept.
+
+    Parameters:
+    - model: fitted Pipeline(CustomTransformer, RandomForestRegressor)
+    - out_dir: destination directory
+    - float32: store leaf values as float32 (halves their size, predictions within float32 rounding)
+
+    Returns:
+    - total size of the artifact in bytes
+    """
+    transformer, forest = split_pipeline(model)
+    arrays = flatten_forest(forest, float32=float32)
+    os.makedirs(out_dir, exist_ok=True)
+    for name in FLAT_ARRAYS:
+        np.save(os.path.join(out_dir, f"{name}.npy"), arrays[name])
+    joblib.dump(transformer, os.path.join(out_dir, "transformer.joblib"))
+
+    names = getattr(forest, "feature_names_in_", None)
+    meta = {
+        "format": "flat_forest_v1",
+        "n_estimators": len(arrays["roots"]),
+        "n_nodes": len(arrays["feature"]),
+        "max_depth": arrays["max_depth"],
+        "value_dtype": str(arrays["value"].dtype),
+        "feature_names": None if names is None else [str(n) for n in names],
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as file:
+        json.dump(meta, file, indent=2)
+    return sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+
+
+def load_flat_model(model_dir, mmap=True):
+    """
+    Loads an exported artifact. With mmap the node arrays are mapped read-only, so every
+    worker process on the host shares the same pages instead of holding its own copy.
+
+    Parameters:
+    - model_dir: directory written by export_model
+    - mmap: memory-map the node arrays instead of reading them
+
+    Returns:
+    - (Pipeline(transformer, FlatForestRegressor), stats dict with load_seconds and rss_mb)
+    """
+    start = time.perf_counter()
+    with open(os.path.join(model_dir, "meta.json")) as file:
+        meta = json.load(file)
+    arrays = {name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+              for name in FLAT_ARRAYS}
+    names = meta.get("feature_names")
+    forest = FlatForestRegressor(max_depth=meta["max_depth"],
+                                 feature_names_in_=None if names is None else np.asarray(names, dtype=object),
+                                 **arrays)
+    transformer = joblib.load(os.path.join(model_dir, "transformer.joblib"))
+    model = Pipeline([("transformer", transformer), ("model", forest)])
+    stats = {"load_seconds": time.perf_counter() - start, "rss_mb": resident_mb(), "format": meta["format"]}
+    return model, stats
+
+
+def resident_mb():
+    """
+    Current resident set size of this process in MB (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the price model as memory-mappable flat arrays.")
+    parser.add_argument("--model", default=latest_artifact())
+    parser.add_argument("--output", default=None, help="default: the model path with a .flat suffix, where app.py looks")
+    parser.add_argument("--float32", action="store_true", help="store leaf values as float32")
+    args = parser.parse_args()
+
+    args.output = args.output or os.path.splitext(args.model)[0] + ".flat"
+    size = export_model(joblib.load(args.model), args.output, float32=args.float32)
+    print(f"Exported {args.model} to {args.output} ({size / 2 ** 20:.1f} MB)")
@@ -0,0 +1,177 @@
+import bisect
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0]
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Instrumentation:
+    def __init__(self, enabled=False, prefix="bmw"):
+        """
+        Opt-in per-stage counters and latency histograms.
+        When disabled, stage() returns a shared no-op context manager.
+
+        Parameters:
+        - enabled: start collecting immediately
+        - prefix: metric name prefix used in the Prometheus export
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._calls = Counter()
+            self._errors = Counter()
+            self._sums = defaultdict(float)
+            self._buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name):
+        """
+        Context manager timing one execution of a pipeline stage.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timer(name)
+
+    @contextlib.contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, failed)
+
+    def timed(self, name):
+        """
+        Decorator version of stage().
+        """
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorator
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            self._calls[name] += 1
+            if failed:
+                self._errors[name] += 1
+            self._sums[name] += seconds
+            self._buckets[name][bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def snapshot(self):
+        """
+        Per-stage calls, errors, total and mean seconds.
+        """
+        with self._lock:
+            return {name: {"calls": calls, "errors": self._errors[name], "seconds": self._sums[name],
+                           "mean_ms": self._sums[name] / calls * 1000}
+                    for name, calls in self._calls.items()}
+
+    def to_prometheus(self):
+        """
+        Renders all stages in the Prometheus text exposition format.
+        """
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Latency of prediction pipeline stages.",
+                 f"# TYPE {p}_stage_seconds histogram"]
+        with self._lock:
+            for name in sorted(self._calls):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ["+Inf"], self._buckets[name]):
+                    cumulative += count
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {self._sums[name]}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {self._calls[name]}')
+            lines.append(f"# HELP {p}_stage_errors_total Stage executions that raised.")
+            lines.append(f"# TYPE {p}_stage_errors_total counter")
+            for name in sorted(self._calls):
+                lines.append(f'{p}_stage_errors_total{{stage="{name}"}} {self._errors[name]}')
+        return "\n".join(lines) + "\n"
+
+    def write_log(self, path):
+        """
+        Appends the current snapshot as one JSON line to a local log file.
+        """
+        with open(path, "a") as file:
+            file.write(json.dumps({"time": time.time(), "stages": self.snapshot()}) + "\n")
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        """
+        Low-overhead statistical profiler: a background thread samples the stacks of all other
+        threads every interval seconds. It can be started and stopped at any time.
+        """
+        self.interval = interval
+        self._samples = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, top=None):
+        """
+        Samples in collapsed-stack format ("frame;frame;frame count"), readable by flamegraph tools.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self._samples.most_common(top))
+
+    def clear(self):
+        self._samples.clear()
+
+
+# Process-wide instances; collection is switched on with BMW_INSTRUMENTATION=1 or instrumentation.enable()
+instrumentation = Instrumentation(enabled=os.environ.get("BMW_INSTRUMENTATION") == "1")
+profiler = SamplingProfiler()
+stage = instrumentation.stage
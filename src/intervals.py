@@ -0,0 +1,100 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.forest_eval import ForestEvaluator
+from src.forest_export import FlatForestRegressor
+from src.instrumentation import stage
+from src.model_metadata import latest_artifact
+from src.model_utils import split_pipeline
+
+
+class PriceIntervalEngine:
+    def __init__(self, model, lower=0.1, upper=0.9, n_jobs=None):
+        """
+        Derives the recommended price range from the spread of the individual tree predictions.
+        The point price is the mean of the same per-tree predictions, so the range costs one
+        pass over the forest rather than an extra one.
+
+        Parameters:
+        - model: fitted Pipeline(CustomTransformer, random forest); the forest may be a
+          RandomForestRegressor or the memory-mapped FlatForestRegressor export
+        - lower, upper: quantiles of the per-tree predictions used as min and max price
+        - n_jobs: threads used by the flat evaluator on large batches
+        """
+        self.transformer, self.forest = split_pipeline(model)
+        self.lower = lower
+        self.upper = upper
+        self._evaluator = ForestEvaluator(self.forest, n_jobs=n_jobs) \
+            if isinstance(self.forest, FlatForestRegressor) else None
+
+    def per_tree(self, X):
+        """
+        Predictions of every tree for transformed features X, shape (n_rows, n_trees).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self._evaluator is not None:
+            return self._evaluator.predict_all(X)
+        # sklearn trees: skip the per-call validation, X is already float32 and contiguous
+        return np.column_stack([tree.predict(X, check_input=False) for tree in self.forest.estimators_])
+
+    def predict_features(self, X):
+        """
+        Point price and range for transformed features.
+
+        Rows with missing or infinite features (e.g. no EngineHP in the VIN record), which
+        model.predict would reject, are not priced: all three values are NaN for them.
+
+        Returns:
+        - (price, min_price, max_price) arrays of shape (n_rows,)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        valid = np.isfinite(X).all(axis=1)
+        prices = np.full((3, X.shape[0]), np.nan)
+        if valid.any():
+            with stage("forest.predict"):
+                per_tree = self.per_tree(X if valid.all() else X[valid])
+            prices[0, valid] = per_tree.mean(axis=1, dtype=np.float64)
+            prices[1:, valid] = np.quantile(per_tree, [self.lower, self.upper], axis=1)
+        return prices[0], prices[1], prices[2]
+
+    def predict(self, X):
+        """
+        Point price and range for raw rows in FEATURES_ORDER.
+        """
+        return self.predict_features(self.transformer.transform(X))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cost of per-tree price ranges over model.predict.")
+    parser.add_argument("--model", default=latest_artifact())
+    parser.add_argument("--data", default=os.path.join("data", "bmw_and_vin_data.csv"))
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import joblib
+    import pandas as pd
+    from src.features import FEATURES_ORDER
+
+    model = joblib.load(args.model)
+    engine = PriceIntervalEngine(model)
+    data = pd.read_csv(args.data, nrows=args.rows)[FEATURES_ORDER]
+    data["Model"] = data["Model"].astype(str)
+    X = engine.transformer.transform(data)
+
+    def best_of(func, *func_args):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func(*func_args)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    for rows in (1, len(X)):
+        base = best_of(engine.forest.predict, X[:rows])
+        ranged = best_of(engine.predict_features, X[:rows])
+        print(f"{rows} rows: model.predict {base * 1000:.2f} ms, with range {ranged * 1000:.2f} ms "
+              f"({ranged / base:.2f}x)")
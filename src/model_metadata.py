@@ -0,0 +1,100 @@
+import glob
+import json
+import math
+import os
+import re
+
+MODELS_DIR = "models"
+MODEL_NAME = "best_random_forest"
+
+
+def artifact_versions(models_dir=MODELS_DIR, name=MODEL_NAME):
+    """
+    Version numbers of the <name>_vN.joblib artifacts in models_dir.
+    """
+    return [int(m.group(1)) for p in glob.glob(os.path.join(models_dir, f"{name}_v*.joblib"))
+            if (m := re.search(r"_v(\d+)\.joblib$", p))]
+
+
+def latest_artifact(models_dir=MODELS_DIR, name=MODEL_NAME):
+    """
+    Path of the highest versioned artifact written by train.py (the v1 path when there is none).
+    """
+    return os.path.join(models_dir, f"{name}_v{max(artifact_versions(models_dir, name), default=1)}.joblib")
+
+
+def metadata_path(model_path):
+    """
+    Path of the metadata file written next to a model artifact. The full artifact name is kept,
+    so an artifact and its flat export (model_v1.joblib, model_v1.flat) never share one file.
+    """
+    return model_path.rstrip(os.sep) + ".meta.json"
+
+
+def read_metadata(model_path):
+    """
+    Metadata of a model artifact, or an empty dict when there is none.
+    """
+    path = metadata_path(model_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def ohe_categories(model):
+    # Imported here so reading metadata does not pull in sklearn
+    from src.model_utils import find_custom_transformer
+
+    transformer = find_custom_transformer(model)
+    return {col: [None if isinstance(c, float) and math.isnan(c) else (c.item() if hasattr(c, "item") else c)
+                  for c in categories]
+            for col, categories in zip(transformer.ohe_columns, transformer.ohe.categories_)}
+
+
+def write_metadata(model_path, model, features_order, **fields):
+    """
+    Writes <artifact>.meta.json describing a trained model.
+
+    Parameters:
+    - model_path: path of the saved artifact
+    - model: the fitted pipeline that was saved
+    - features_order: input column order the pipeline expects
+    - fields: extra entries (training time, data fingerprint, hyperparameters, ...)
+    """
+    meta = {
+        "artifact": os.path.basename(model_path),
+        "features_order": list(features_order),
+        "ohe_categories": ohe_categories(model),
+    }
+    meta.update(fields)
+    with open(metadata_path(model_path), "w") as file:
+        json.dump(meta, file, indent=2, default=str)
+    return meta
+
+
+def verify_model(model_path, model, features_order, fingerprint=None):
+    """
+    Checks a loaded model against its metadata file.
+
+    Parameters:
+    - model_path: path the model was loaded from
+    - model: the loaded pipeline
+    - features_order: input column order the caller will feed
+    - fingerprint: model_fingerprint of the artifact, compared when the metadata records one
+
+    Returns:
+    - list of problems (empty when the model matches, or when no metadata file exists)
+    """
+    meta = read_metadata(model_path)
+    if not meta:
+        return []
+
+    problems = []
+    if meta.get("features_order") != list(features_order):
+        problems.append("feature order differs from the one the model was trained with")
+    if meta.get("ohe_categories") is not None and meta["ohe_categories"] != ohe_categories(model):
+        problems.append("one-hot categories differ from the training metadata")
+    if fingerprint and meta.get("artifact_fingerprint") and meta["artifact_fingerprint"] != fingerprint:
+        problems.append("artifact content does not match the fingerprint recorded at training time")
+    return problems
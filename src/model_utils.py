@@ -0,0 +1,31 @@
+from sklearn.pipeline import Pipeline
+
+from src.transformers import CustomTransformer
+
+
+def split_pipeline(model):
+    """
+    Splits the fitted price pipeline into its feature transformer and final estimator.
+
+    Parameters:
+    - model: fitted sklearn Pipeline ending with the regressor
+
+    Returns:
+    - (transformer, estimator) tuple; transformer is None if the pipeline has no preprocessing step
+    """
+    if not isinstance(model, Pipeline):
+        return None, model
+    transformer = model[:-1] if len(model.steps) > 1 else None
+    if transformer is not None and len(transformer.steps) == 1:
+        transformer = transformer.steps[0][1]
+    return transformer, model.steps[-1][1]
+
+
+def find_custom_transformer(model):
+    """
+    Returns the fitted CustomTransformer step of the pipeline.
+    """
+    for _, step in getattr(model, "steps", []):
+        if isinstance(step, CustomTransformer):
+            return step
+    raise ValueError("The model pipeline does not contain a CustomTransformer step.")
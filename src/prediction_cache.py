@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def model_fingerprint(path):
+    """
+    Content hash of a model artifact (a joblib file or an exported directory).
+    Any retrained or re-exported model gets a new fingerprint.
+    """
+    digest = hashlib.sha256()
+    paths = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    def __init__(self, fingerprint, max_items=10000, path=None):
+        """
+        Memoizes predictions keyed on the transformed feature vector and the model fingerprint.
+
+        Parameters:
+        - fingerprint: model_fingerprint of the loaded model
+        - max_items: size of the in-process LRU tier
+        - path: optional SQLite file for a durable tier shared by processes
+        """
+        self.fingerprint = fingerprint
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "miss_seconds": 0.0}
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_results (key TEXT PRIMARY KEY, fingerprint TEXT, value TEXT)")
+            # Entries of other model versions can never hit again
+            self._conn.execute("DELETE FROM prediction_results WHERE fingerprint != ?", (fingerprint,))
+            self._conn.commit()
+
+    def key(self, features):
+        x = np.ascontiguousarray(features, dtype=np.float64)
+        return hashlib.sha1(self.fingerprint.encode() + x.tobytes()).hexdigest()
+
+    def get_or_compute(self, features, compute):
+        """
+        Returns the cached prediction for a feature vector, calling compute() on a miss.
+
+        Parameters:
+        - features: transformed feature vector of one car
+        - compute: zero-argument callable returning the prediction (any JSON-serializable value)
+        """
+        key = self.key(features)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._memory[key]
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value FROM prediction_results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.stats["hits"] += 1
+                    return value
+
+        start = time.perf_counter()
+        value = compute()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["miss_seconds"] += elapsed
+            self._remember(key, value)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO prediction_results VALUES (?, ?, ?)",
+                                   (key, self.fingerprint, json.dumps(value)))
+                self._conn.commit()
+        return value
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def saved_seconds(self):
+        """
+        Estimated compute time avoided: hits times the mean cost of a miss.
+        """
+        if not self.stats["misses"]:
+            return 0.0
+        return self.stats["hits"] * self.stats["miss_seconds"] / self.stats["misses"]
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
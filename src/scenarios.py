@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from src.features import FEATURES_ORDER
+from src.instrumentation import stage
+
+PRICE_COLS = ["Price", "MinPrice", "MaxPrice"]
+
+
+def scenario_grid(row, mileages, ages, years=None):
+    """
+    Every (Mileage, NumOfYears, Year) combination of one car as a single batch.
+
+    Parameters:
+    - row: dict keyed like FEATURES_ORDER, e.g. from src.fast_predict.build_row
+    - mileages: mileage values to try
+    - ages: NumOfYears values to try
+    - years: model years to try (default: the car's own year)
+
+    Returns:
+    - DataFrame in FEATURES_ORDER with one row per combination
+    """
+    years = [row["Year"]] if years is None else years
+    combos = list(itertools.product(mileages, ages, years))
+    grid = pd.DataFrame([row] * len(combos))[FEATURES_ORDER]
+    grid[["Mileage", "NumOfYears", "Year"]] = np.asarray(combos)
+    return grid
+
+
+def price_grid(engine, row, mileages, ages, years=None):
+    """
+    Prices every scenario of one car with one transform and one pass over the forest.
+
+    Parameters:
+    - engine: PriceIntervalEngine of the loaded model
+    - row, mileages, ages, years: see scenario_grid
+
+    Returns:
+    - DataFrame with Mileage, NumOfYears, Year, Price, MinPrice and MaxPrice
+    """
+    grid = scenario_grid(row, mileages, ages, years)
+    with stage("scenarios.predict"):
+        prices = engine.predict(grid)
+    result = grid[["Mileage", "NumOfYears", "Year"]].reset_index(drop=True)
+    for col, values in zip(PRICE_COLS, prices):
+        result[col] = np.round(values)
+    return result
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+from src.features import VIN_COLS, FEATURES_ORDER
+from src.model_metadata import latest_artifact, read_metadata
+from src.warmup import ModelWarmer, WARMUP_INPUT, WARMUP_VIN_RESULT
+
+# Only stdlib and light modules at the top: pandas, numpy, sklearn, joblib and the prediction
+# modules are imported by the warm-up thread, so the first page is drawn while the model loads
+
+MODEL_VARIANT = os.environ.get("BMW_MODEL_VARIANT", "full")  # "surrogate" serves the distilled forest
+MAE_BUDGET = float(os.environ.get("BMW_MAE_BUDGET", "250"))  # max extra test MAE in $ allowed for the surrogate
+READY_FILE = os.environ.get("BMW_READY_FILE")  # created once the model is warm, for readiness probes
+
+
+def artifact_paths():
+    """
+    (joblib artifact, its flat export, its surrogate). The artifact is the newest one written
+    by train.py unless BMW_MODEL_PATH pins one.
+    """
+    model_path = os.environ.get("BMW_MODEL_PATH") or latest_artifact()
+    stem = os.path.splitext(model_path)[0]
+    # Written by python -m src.forest_export and by distill.py
+    return model_path, stem + ".flat", stem + ".surrogate.joblib"
+
+
+_surrogate_decisions = {}
+_surrogate_lock = threading.Lock()
+
+
+def use_surrogate(surrogate_path):
+    """
+    True when the surrogate is requested, exists and its measured accuracy loss is within MAE_BUDGET.
+    Decided (and logged) once per surrogate file version, not on every script rerun.
+    """
+    if MODEL_VARIANT != "surrogate" or not os.path.exists(surrogate_path):
+        return False
+    key = (surrogate_path, os.path.getmtime(surrogate_path))
+    with _surrogate_lock:
+        if key not in _surrogate_decisions:
+            # MAE change on the teacher's holdout, or the mean difference to the teacher when that is unknown
+            error = read_metadata(surrogate_path).get("budget_error")
+            within = error is not None and error <= MAE_BUDGET
+            if not within:
+                print(f"Surrogate error {error} is over the ${MAE_BUDGET:.0f} budget, serving the full model")
+            _surrogate_decisions[key] = within
+        return _surrogate_decisions[key]
+
+
+def model_artifact():
+    """
+    Path of the model artifact in use and its modification time (None when it does not exist).
+    The time is passed to the loaders so a replaced artifact is picked up.
+    """
+    model_path, flat_path, surrogate_path = artifact_paths()
+    if use_surrogate(surrogate_path):
+        path = surrogate_path
+    else:
+        path = flat_path if os.path.isdir(flat_path) else model_path
+    return path, os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def load_model(model_path):
+    """
+    Load the trained model chosen by model_artifact.
+    A directory is the memory-mapped flat export (python -m src.forest_export).
+    """
+    from src.forest_export import load_flat_model, resident_mb
+
+    if os.path.isdir(model_path):
+        model, stats = load_flat_model(model_path)
+        print(f"Loaded {model_path} in {stats['load_seconds']:.3f}s, RSS {stats['rss_mb']:.0f} MB")
+        return model
+    import joblib
+
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    print(f"Loaded {model_path} in {time.perf_counter() - start:.3f}s, RSS {resident_mb():.0f} MB")
+    return model
+
+
+def load_services(model_path):
+    """
+    Everything a prediction needs: the model, its single-row plan, the price range engine,
+    the prediction memo shared by all sessions and the result of the metadata check.
+    """
+    from src.fast_predict import SingleRowPredictor
+    from src.intervals import PriceIntervalEngine
+    from src.model_metadata import verify_model
+    from src.prediction_cache import PredictionCache, model_fingerprint
+
+    model = load_model(model_path)
+    prediction_cache = PredictionCache(model_fingerprint(model_path), path=os.path.join("data", "prediction_cache.sqlite"))
+    return {
+        "model": model,
+        "predictor": SingleRowPredictor(model, FEATURES_ORDER),
+        "interval_engine": PriceIntervalEngine(model),
+        "prediction_cache": prediction_cache,
+        # Compare the loaded model with the metadata written by train.py, if there is any
+        "problems": verify_model(model_path, model, FEATURES_ORDER, prediction_cache.fingerprint),
+    }
+
+
+def warm_services(services):
+    """
+    Price a throwaway car once, bypassing the prediction memo.
+    """
+    from src.fast_predict import build_row
+
+    features = services["predictor"].features(build_row(WARMUP_INPUT, WARMUP_VIN_RESULT, VIN_COLS)).copy()
+    services["interval_engine"].predict_features(features)
+
+
+_warmers = {}
+_warmers_lock = threading.Lock()
+
+
+def model_warmer(model_path, model_mtime):
+    """
+    The process-wide ModelWarmer of one artifact version, started on first use.
+    run_app.py calls it before Streamlit starts, so the model is loaded (and BMW_READY_FILE
+    written) without waiting for the first browser session; app.py then finds it running.
+    """
+    with _warmers_lock:
+        key = (model_path, model_mtime)
+        if key not in _warmers:
+            _warmers[key] = ModelWarmer(lambda: load_services(model_path), warm_services, READY_FILE).start()
+        return _warmers[key]
@@ -4,6 +4,20 @@ from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.exceptions import NotFittedError
 
+from src.instrumentation import stage
+
+# Model substrings turned into binary engine/drive flags
+MODEL_PATTERNS = {
+    'is_xDrive': 'xDrive',
+    'is_sDrive': 'sDrive',
+    'is_AWD': 'AWD',
+    '28i': '28i',
+    '35i': '35i',
+    '28d': '28d',
+    '35d': '35d',
+    '50i': '50i'
+}
+
 class CustomTransformer(BaseEstimator, TransformerMixin):
     def __init__(self, vin_nonNumeric_cols=None):
         """
@@ -96,52 +110,7 @@ class CustomTransformer(BaseEstimator, TransformerMixin):
         Returns:
         - self
         """
-        # Make a copy to avoid modifying the original data
-        X_transformed = X.copy()
-        
-        # Feature Engineering Steps
-        X_transformed['Region'] = X_transformed["State"].apply(self._get_region).map(self.gdp_map)
-        X_transformed["Mileage_per_year"] = X_transformed.apply(self._get_mileage_per_year, axis=1)
-        X_transformed["Mileage"] = np.log(X_transformed["Mileage"].replace(0, np.nan))
-        X_transformed["Mileage_per_year"] = np.log(X_transformed["Mileage_per_year"].replace(0, np.nan))
-        
-        # Handle possible infinite or NaN values after log transformation
-        X_transformed["Mileage"].replace([np.inf, -np.inf], np.nan, inplace=True)
-        X_transformed["Mileage_per_year"].replace([np.inf, -np.inf], np.nan, inplace=True)
-        
-        # It's advisable to handle missing values here if necessary
-        
-        # Create additional engineered features
-        X_transformed['Power_perCylinder'] = X_transformed['EngineHP'] / X_transformed['EngineCylinders']
-        X_transformed['Power_perDisplacement'] = X_transformed["EngineHP"] / X_transformed["DisplacementL"]
-        X_transformed['CylinderSize'] = X_transformed["DisplacementL"] / X_transformed["EngineCylinders"]
-        X_transformed['TotalPowerOutput'] = X_transformed["EngineHP"] * X_transformed["EngineCylinders"]
-        X_transformed['TotalPowerCapacity'] = X_transformed["DisplacementL"] * X_transformed["EngineCylinders"]
-        
-        # Drop the 'Year' column as per the original preprocessing
-        if "Year" in X_transformed.columns:
-            X_transformed.drop(columns="Year", inplace=True)
-        
-        # Model by Series and Engine grouping
-        model_patterns = {
-            'is_xDrive': 'xDrive',
-            'is_sDrive': 'sDrive',
-            'is_AWD': 'AWD',
-            '28i': '28i',
-            '35i': '35i',
-            '28d': '28d',
-            '35d': '35d',
-            '50i': '50i'
-        }
-        
-        for new_col, pattern in model_patterns.items():
-            X_transformed[new_col] = X_transformed['Model'].str.contains(pattern).astype(int)
-        
-        # Map 'BodyClass' using bodyclass_map
-        X_transformed["BodyClass"] = X_transformed["BodyClass"].map(self.bodyclass_map)
-        
-        # Group into Series using _get_series method
-        X_transformed["Model"] = X_transformed["Model"].apply(self._get_series)
+        X_transformed = self._engineer_features(X)
         
         # Fit OneHotEncoder on the specified categorical columns
         self.ohe.fit(X_transformed[self.ohe_columns])
@@ -162,62 +131,17 @@ class CustomTransformer(BaseEstimator, TransformerMixin):
         if not self.fitted:
             raise NotFittedError("This CustomTransformer instance is not fitted yet. Call 'fit' with appropriate data before using this transformer.")
 
-        # Make a copy to avoid modifying the original data
-        X_transformed = X.copy()
-        
-        # Feature Engineering
-        X_transformed['Region'] = X_transformed["State"].apply(self._get_region).map(self.gdp_map)
-        X_transformed["Mileage_per_year"] = X_transformed.apply(self._get_mileage_per_year, axis=1)
-        
-        # Log-transform 'Mileage' and 'Mileage_per_year'
-        X_transformed["Mileage"] = np.log(X_transformed["Mileage"].replace(0, np.nan))
-        X_transformed["Mileage_per_year"] = np.log(X_transformed["Mileage_per_year"].replace(0, np.nan))
-        
-        # Handle possible infinite or NaN values after log transformation
-        X_transformed["Mileage"].replace([np.inf, -np.inf], np.nan, inplace=True)
-        X_transformed["Mileage_per_year"].replace([np.inf, -np.inf], np.nan, inplace=True)
-        
-        # It's advisable to handle missing values here if necessary
-        
-        # Create additional engineered features
-        X_transformed['Power_perCylinder'] = X_transformed['EngineHP'] / X_transformed['EngineCylinders']
-        X_transformed['Power_perDisplacement'] = X_transformed["EngineHP"] / X_transformed["DisplacementL"]
-        X_transformed['CylinderSize'] = X_transformed["DisplacementL"] / X_transformed["EngineCylinders"]
-        X_transformed['TotalPowerOutput'] = X_transformed["EngineHP"] * X_transformed["EngineCylinders"]
-        X_transformed['TotalPowerCapacity'] = X_transformed["DisplacementL"] * X_transformed["EngineCylinders"]
-        
-        # Drop the 'Year' column as per the original preprocessing
-        if "Year" in X_transformed.columns:
-            X_transformed.drop(columns="Year", inplace=True)
-        
-        # Model by Series and Engine grouping
-        model_patterns = {
-            'is_xDrive': 'xDrive',
-            'is_sDrive': 'sDrive',
-            'is_AWD': 'AWD',
-            '28i': '28i',
-            '35i': '35i',
-            '28d': '28d',
-            '35d': '35d',
-            '50i': '50i'
-        }
-        
-        for new_col, pattern in model_patterns.items():
-            X_transformed[new_col] = X_transformed['Model'].str.contains(pattern).astype(int)
-        
-        # Map 'BodyClass' using bodyclass_map
-        X_transformed["BodyClass"] = X_transformed["BodyClass"].map(self.bodyclass_map)
-        
-        # Group into Series using _get_series method
-        X_transformed["Model"] = X_transformed["Model"].apply(self._get_series)
+        X_transformed = self._engineer_features(X)
         
         # One-Hot Encode categorical features using the fitted OneHotEncoder
-        ohe_encoded = self.ohe.transform(X_transformed[self.ohe_columns])
-        ohe_feature_names = self.ohe.get_feature_names_out(self.ohe_columns)
-        ohe_df = pd.DataFrame(ohe_encoded, columns=ohe_feature_names, index=X_transformed.index)
+        with stage("transform.ohe"):
+            ohe_encoded = self.ohe.transform(X_transformed[self.ohe_columns])
+            ohe_feature_names = self.ohe.get_feature_names_out(self.ohe_columns)
+            ohe_df = pd.DataFrame(ohe_encoded, columns=ohe_feature_names, index=X_transformed.index)
         
         # Concatenate the one-hot encoded columns to the dataframe
-        X_transformed = pd.concat([X_transformed.drop(columns=self.ohe_columns), ohe_df], axis=1)
+        with stage("transform.concat"):
+            X_transformed = pd.concat([X_transformed.drop(columns=self.ohe_columns), ohe_df], axis=1)
         
         # Define columns to exclude from features
         exclude_cols = ["Price", "Vin", "Make", "City", "ModelVIN", "State"] + self.vin_nonNumeric_cols
@@ -238,6 +162,219 @@ class CustomTransformer(BaseEstimator, TransformerMixin):
         
         return X_features
 
+    def _engineer_features(self, X):
+        """
+        Feature engineering shared by fit and transform. Every step is vectorized:
+        per-row lookups are evaluated once per distinct value and broadcast back.
+
+        Parameters:
+        - X: pandas DataFrame
+
+        Returns:
+        - X_transformed: copy of X with the engineered columns, before one-hot encoding
+        """
+        # Make a copy to avoid modifying the original data
+        with stage("transform.copy"):
+            X_transformed = X.copy()
+
+        for name, values in self._engineered_columns(X).items():
+            X_transformed[name] = values
+
+        # Drop the 'Year' column as per the original preprocessing
+        if "Year" in X_transformed.columns:
+            X_transformed.drop(columns="Year", inplace=True)
+
+        return X_transformed
+
+    def _engineered_columns(self, X):
+        """
+        Computes the new and rewritten columns without copying X.
+
+        Parameters:
+        - X: pandas DataFrame
+
+        Returns:
+        - dict of column name -> Series, in the order the columns are added
+        """
+        columns = {}
+
+        # Feature Engineering
+        with stage("transform.region"):
+            columns['Region'] = self._map_distinct(
+                X["State"], lambda state: self.gdp_map[self._get_region(state)],
+                missing=self.gdp_map['Non-US'], dtype=np.int64)
+
+        with stage("transform.mileage"):
+            mileage_per_year = self._mileage_per_year(X)
+
+            # Log-transform 'Mileage' and 'Mileage_per_year'
+            mileage = np.log(X["Mileage"].replace(0, np.nan))
+            mileage_per_year = np.log(mileage_per_year.replace(0, np.nan))
+
+            # Handle possible infinite or NaN values after log transformation
+            columns["Mileage_per_year"] = mileage_per_year.replace([np.inf, -np.inf], np.nan)
+            columns["Mileage"] = mileage.replace([np.inf, -np.inf], np.nan)
+
+        # Create additional engineered features
+        columns['Power_perCylinder'] = X['EngineHP'] / X['EngineCylinders']
+        columns['Power_perDisplacement'] = X["EngineHP"] / X["DisplacementL"]
+        columns['CylinderSize'] = X["DisplacementL"] / X["EngineCylinders"]
+        columns['TotalPowerOutput'] = X["EngineHP"] * X["EngineCylinders"]
+        columns['TotalPowerCapacity'] = X["DisplacementL"] * X["EngineCylinders"]
+
+        # Model by Series and Engine grouping: match every pattern once per distinct model
+        with stage("transform.model"):
+            codes, models = pd.factorize(X['Model'])
+            flags = np.zeros((len(models) + 1, len(MODEL_PATTERNS)), dtype=np.int64)
+            for i, model in enumerate(models):
+                flags[i] = [pattern in model for pattern in MODEL_PATTERNS.values()]
+            flags = flags[codes]
+            for j, new_col in enumerate(MODEL_PATTERNS):
+                columns[new_col] = pd.Series(flags[:, j], index=X.index)
+
+            # Map 'BodyClass' using bodyclass_map
+            columns["BodyClass"] = X["BodyClass"].map(self.bodyclass_map)
+
+            # Group into Series using _get_series method
+            columns["Model"] = self._map_distinct(X["Model"], self._get_series, missing=None, dtype=object)
+
+        return columns
+
+    def get_feature_names_out(self, input_features):
+        """
+        Output columns of transform for input columns input_features, without transforming any data.
+        """
+        columns = [col for col in input_features if col != "Year"]
+        engineered = ['Region', 'Mileage_per_year', 'Power_perCylinder', 'Power_perDisplacement', 'CylinderSize',
+                      'TotalPowerOutput', 'TotalPowerCapacity'] + list(MODEL_PATTERNS)
+        columns += [col for col in engineered if col not in columns]
+        columns = [col for col in columns if col not in self.ohe_columns]
+        columns += list(self.ohe.get_feature_names_out(self.ohe_columns))
+        exclude_cols = ["Price", "Vin", "Make", "City", "ModelVIN", "State"] + self.vin_nonNumeric_cols
+        return [col for col in columns if col not in exclude_cols and col not in self.columns_to_drop]
+
+    def transform_array(self, X, dtype=np.float32, sparse=False, chunksize=100000):
+        """
+        Low-memory variant of transform returning a matrix instead of a DataFrame.
+
+        The output is allocated once and filled chunk by chunk, so peak memory is the output
+        plus the temporaries of one chunk. X is never copied and no dense float64 one-hot frame
+        is built. Columns are in the order given by get_feature_names_out(X.columns).
+
+        Parameters:
+        - X: pandas DataFrame
+        - dtype: dtype of the output (float32 matches what the random forest uses internally)
+        - sparse: return a scipy CSR matrix; the one-hot block is never densified
+        - chunksize: rows processed at a time
+
+        Returns:
+        - ndarray of shape (n_rows, n_features), or scipy.sparse.csr_matrix when sparse
+        """
+        if not self.fitted:
+            raise NotFittedError("This CustomTransformer instance is not fitted yet. Call 'fit' with appropriate data before using this transformer.")
+
+        names = self.get_feature_names_out(X.columns)
+        ohe_positions = self._ohe_positions(names)
+        ohe_names = set(self.ohe.get_feature_names_out(self.ohe_columns))
+        dense_names = [name for name in names if name not in ohe_names]
+        n_dense = len(dense_names)
+
+        # Dense output is written in place; for sparse output only the non one-hot block is dense
+        result = np.zeros((len(X), len(names) if not sparse else n_dense), dtype=dtype)
+        ohe_rows, ohe_cols = [], []
+        for start in range(0, len(X), chunksize):
+            chunk = X.iloc[start:start + chunksize]
+            engineered = self._engineered_columns(chunk)
+            for j, name in enumerate(dense_names):
+                values = engineered[name] if name in engineered else chunk[name]
+                result[start:start + len(chunk), j] = values.to_numpy()
+            with stage("transform.ohe"):
+                for col, categories, (positions, missing_position) in zip(
+                        self.ohe_columns, self.ohe.categories_, ohe_positions):
+                    values = engineered[col] if col in engineered else chunk[col]
+                    known = [c for c in categories if not self._is_missing(c)]
+                    codes = pd.Categorical(values, categories=known).codes.astype(np.int64)
+                    # Unknown categories are ignored, as with handle_unknown='ignore'
+                    out = positions[codes] if len(positions) else np.full(len(codes), -1)
+                    out[codes < 0] = -1
+                    if missing_position >= 0:
+                        out[pd.isna(values).to_numpy()] = missing_position
+                    hit = out >= 0
+                    ohe_rows.append(np.flatnonzero(hit) + start)
+                    ohe_cols.append(out[hit])
+
+        rows = np.concatenate(ohe_rows) if ohe_rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(ohe_cols) if ohe_cols else np.empty(0, dtype=np.int64)
+        if not sparse:
+            result[rows, cols] = 1
+            return result
+
+        from scipy import sparse as sp
+        ohe_block = sp.csr_matrix((np.ones(len(rows), dtype=dtype), (rows, cols - n_dense)),
+                                  shape=(len(X), len(names) - n_dense))
+        return sp.hstack([sp.csr_matrix(result), ohe_block], format="csr")
+
+    def transform_chunks(self, chunks, dtype=np.float32, sparse=False):
+        """
+        Transforms an iterable of DataFrames (e.g. pd.read_csv(..., chunksize=...)) lazily,
+        yielding one matrix per chunk.
+        """
+        for chunk in chunks:
+            yield self.transform_array(chunk, dtype=dtype, sparse=sparse, chunksize=max(len(chunk), 1))
+
+    @staticmethod
+    def _is_missing(value):
+        return value is None or (isinstance(value, float) and np.isnan(value))
+
+    def _ohe_positions(self, names):
+        """
+        For every one-hot column: the output position of each non-missing category (-1 if
+        the column was dropped) and the output position of the missing-value category.
+        """
+        position = {name: i for i, name in enumerate(names)}
+        ohe_names = iter(self.ohe.get_feature_names_out(self.ohe_columns))
+        result = []
+        for categories in self.ohe.categories_:
+            positions, missing_position = [], -1
+            for category in categories:
+                i = position.get(next(ohe_names), -1)
+                if self._is_missing(category):
+                    missing_position = i
+                else:
+                    positions.append(i)
+            result.append((np.asarray(positions, dtype=np.int64), missing_position))
+        return result
+
+    @staticmethod
+    def _map_distinct(values, func, missing, dtype):
+        """
+        Applies func once per distinct value of a Series and broadcasts the results.
+
+        Parameters:
+        - values: pandas Series
+        - func: function applied to every distinct non-missing value
+        - missing: result used for missing values
+        - dtype: dtype of the resulting Series
+
+        Returns:
+        - pandas Series aligned with values
+        """
+        codes, uniques = pd.factorize(values)
+        mapped = np.empty(len(uniques) + 1, dtype=dtype)
+        mapped[:-1] = [func(value) for value in uniques]
+        mapped[-1] = missing  # code -1 marks missing values
+        return pd.Series(mapped[codes], index=values.index, name=values.name)
+
+    @staticmethod
+    def _mileage_per_year(X):
+        """
+        Vectorized equivalent of _get_mileage_per_year over a whole DataFrame.
+        """
+        mileage = X["Mileage"].to_numpy(dtype=np.float64) if "Mileage" in X else np.zeros(len(X))
+        num_years = X["NumOfYears"].to_numpy(dtype=np.float64) if "NumOfYears" in X else np.zeros(len(X))
+        per_year = np.divide(mileage, num_years, out=mileage.copy(), where=num_years != 0)
+        return pd.Series(per_year, index=X.index)
+
     def _get_series(self, model):
         """
         Maps the model to its corresponding series based on series_map.
@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from src.instrumentation import stage
+from src.vin_utils import get_vin_data
+
+
+DEFAULT_CACHE_PATH = os.path.join("data", "vin_cache.sqlite")
+
+
+class VinCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_memory_items=1024,
+                 ttl=None, negative_ttl=15 * 60, fetch=get_vin_data):
+        """
+        Two-tier cache for decoded VIN responses.
+
+        Parameters:
+        - path: path of the SQLite file used as the durable tier (":memory:" for none)
+        - max_memory_items: size of the in-process LRU tier
+        - ttl: seconds a successful decode stays valid (None keeps it forever)
+        - negative_ttl: seconds a failed decode is remembered before retrying
+        - fetch: callable used on a miss, same signature as get_vin_data
+        """
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.fetch = fetch
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "negative_hits": 0}
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vin_cache ("
+            "vin TEXT PRIMARY KEY, payload TEXT NOT NULL, ok INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize(vin):
+        return vin.strip().upper()
+
+    def get(self, vin):
+        """
+        Returns the decoded response for a VIN, going to the network only on a miss.
+
+        Parameters:
+        - vin: VIN string, normalized before lookup
+
+        Returns:
+        - dict shaped like the DecodeVinValues response ({} for a failed lookup or a network error)
+        """
+        vin = self.normalize(vin)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(vin)
+            if entry is not None and not self._expired(entry, now):
+                self._memory.move_to_end(vin)
+                self._count_hit("memory_hits", entry)
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT payload, ok, created FROM vin_cache WHERE vin = ?", (vin,)
+            ).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), bool(row[1]), row[2])
+                if not self._expired(entry, now):
+                    self._remember(vin, entry)
+                    self._count_hit("disk_hits", entry)
+                    return entry[0]
+
+            self.stats["misses"] += 1
+
+        try:
+            with stage("vin_decode.fetch"):
+                payload = self.fetch(vin)
+        except requests.RequestException:
+            # Timeouts and connection errors are remembered for negative_ttl like any failed lookup
+            payload = {}
+        self.put(vin, payload)
+        return payload
+
+    def put(self, vin, payload):
+        """
+        Stores a decoded response. Empty or resultless payloads are cached as negative entries.
+        """
+        vin = self.normalize(vin)
+        ok = bool(payload and payload.get("Results"))
+        entry = (payload or {}, ok, time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vin_cache (vin, payload, ok, created) VALUES (?, ?, ?, ?)",
+                (vin, json.dumps(entry[0]), int(ok), entry[2]),
+            )
+            self._conn.commit()
+            self._remember(vin, entry)
+
+    def seed_from_csv(self, csv_path=os.path.join("data", "vin_data.csv"), vin_col="VIN", chunksize=10000):
+        """
+        Pre-populates the durable tier from an already decoded VIN table.
+
+        Parameters:
+        - csv_path: CSV with one decoded row per VIN (columns as returned by NHTSA)
+        - vin_col: name of the VIN column
+        - chunksize: rows read per chunk
+
+        Returns:
+        - number of VINs written
+        """
+        import pandas as pd
+
+        written = 0
+        created = time.time()
+        for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+            chunk = chunk.loc[:, ~chunk.columns.str.startswith("Unnamed")]
+            rows = []
+            for record in chunk.to_dict(orient="records"):
+                vin = self.normalize(record.get(vin_col, ""))
+                if len(vin) != 17:
+                    continue
+                payload = {"Count": 1, "Results": [record]}
+                rows.append((vin, json.dumps(payload), 1, created))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO vin_cache (vin, payload, ok, created) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+            written += len(rows)
+        return written
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["negative_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM vin_cache").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def _expired(self, entry, now):
+        payload, ok, created = entry
+        ttl = self.ttl if ok else self.negative_ttl
+        return ttl is not None and now - created > ttl
+
+    def _count_hit(self, key, entry):
+        self.stats[key if entry[1] else "negative_hits"] += 1
+
+    def _remember(self, vin, entry):
+        self._memory[vin] = entry
+        self._memory.move_to_end(vin)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+
+if __name__ == "__main__":
+    cache = VinCache()
+    print(f"Seeded {cache.seed_from_csv()} VINs into {cache.path}")
@@ -0,0 +1,132 @@
+import os
+import threading
+from bisect import bisect_left
+
+from src.vin_utils import get_vin_data
+
+
+# Attributes fixed by the WMI/VDS, model year and plant positions of a VIN
+PATTERN_COLS = ['EngineCylinders', 'DisplacementL', 'DisplacementCI', 'DisplacementCC',
+                'FuelTypePrimary', 'GVWR', 'EngineHP', 'Doors', 'BodyClass', 'Model',
+                'PlantCountry', 'PlantCity', 'Manufacturer', 'VehicleType']
+
+
+def vin_pattern(vin):
+    """
+    Builds the lookup key of a VIN: WMI + VDS (positions 1-8) followed by the
+    model year and plant codes (positions 10-11). The check digit and the serial
+    number carry no vehicle attributes and are left out.
+    """
+    return vin[:8] + vin[9:11]
+
+
+class OfflineVinDecoder:
+    def __init__(self, csv_path=os.path.join("data", "vin_data.csv"), vin_col="VIN", fallback=get_vin_data):
+        """
+        Local VIN decoder backed by a sorted prefix index of already decoded VINs.
+
+        Parameters:
+        - csv_path: decoded VIN table used to build the index
+        - vin_col: name of the VIN column in csv_path
+        - fallback: callable used when the index has no matching pattern (None to stay offline)
+        """
+        import pandas as pd
+
+        self.fallback = fallback
+        self.stats = {"index_hits": 0, "prefix_hits": 0, "fallbacks": 0}
+
+        table = pd.read_csv(csv_path, usecols=[vin_col] + PATTERN_COLS, dtype=str, keep_default_na=False)
+        table[vin_col] = table[vin_col].str.strip().str.upper()
+        table = table[table[vin_col].str.len() == 17]
+        table["pattern"] = table[vin_col].str[:8] + table[vin_col].str[9:11]
+
+        # Full patterns: first decoded row wins, NHTSA answers the same for the same pattern
+        full = table.drop_duplicates("pattern").sort_values("pattern")
+        self._keys = full["pattern"].tolist()
+        self._rows = full[PATTERN_COLS].to_dict(orient="records")
+
+        # WMI + VDS prefixes are only kept when every model year/plant agrees on the attributes
+        table["prefix"] = table["pattern"].str[:8]
+        distinct = table.drop_duplicates(["prefix"] + PATTERN_COLS)
+        unambiguous = distinct[~distinct["prefix"].duplicated(keep=False)].sort_values("prefix")
+        self._prefix_keys = unambiguous["prefix"].tolist()
+        self._prefix_rows = unambiguous[PATTERN_COLS].to_dict(orient="records")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, vin):
+        """
+        Returns the indexed attributes of a VIN, or None if its pattern is unknown.
+        """
+        vin = vin.strip().upper()
+        row = self._search(self._keys, self._rows, vin_pattern(vin))
+        if row is not None:
+            self.stats["index_hits"] += 1
+            return row
+        row = self._search(self._prefix_keys, self._prefix_rows, vin[:8])
+        if row is not None:
+            self.stats["prefix_hits"] += 1
+        return row
+
+    def get_vin_data(self, vin):
+        """
+        Drop-in replacement for src.vin_utils.get_vin_data answering from the local index.
+
+        Parameters:
+        - vin: VIN string
+
+        Returns:
+        - dict shaped like the DecodeVinValues response ({} if unknown and offline)
+        """
+        vin = vin.strip().upper()
+        row = self.lookup(vin) if len(vin) == 17 else None
+        if row is not None:
+            return {"Count": 1, "Message": "Decoded from local VIN index",
+                    "Results": [dict(row, VIN=vin)]}
+
+        self.stats["fallbacks"] += 1
+        if self.fallback is None:
+            return {}
+        return self.fallback(vin)
+
+    @staticmethod
+    def _search(keys, rows, key):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return rows[i]
+        return None
+
+
+def vin_fetcher(csv_path=os.path.join("data", "vin_data.csv"), fallback=get_vin_data):
+    """
+    get_vin_data answered from the local index, or fallback alone when the index cannot be
+    built (missing file, or a git-LFS pointer instead of the CSV).
+    """
+    try:
+        return OfflineVinDecoder(csv_path, fallback=fallback).get_vin_data
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Local VIN index unavailable ({e}), decoding through NHTSA only")
+        return fallback
+
+
+class LazyVinDecoder:
+    def __init__(self, csv_path=os.path.join("data", "vin_data.csv"), fallback=get_vin_data):
+        """
+        vin_fetcher that reads and indexes csv_path on first use instead of on construction,
+        so creating it costs nothing on the page-rendering thread. Call load() from a
+        background thread to build the index ahead of the first lookup.
+        """
+        self.csv_path = csv_path
+        self.fallback = fallback
+        self._fetch = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._fetch is None:
+                self._fetch = vin_fetcher(self.csv_path, self.fallback)
+        return self._fetch
+
+    def get_vin_data(self, vin):
+        return self.load()(vin)
@@ -0,0 +1,73 @@
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.features import VIN_NUMERIC_COLS
+from src.vin_scraper import read_batches, file_path
+
+
+VIN_SCHEMA = pa.schema(
+    [(col, pa.float64()) for col in VIN_NUMERIC_COLS]
+    + [(col, pa.string()) for col in ['FuelTypePrimary', 'GVWR', 'BodyClass', 'Model',
+                                     'PlantCountry', 'PlantCity', 'VIN', 'Manufacturer', 'VehicleType']]
+)
+
+
+def results_to_table(results, schema=VIN_SCHEMA):
+    """
+    Converts a list of decoded "Results" records into an Arrow table with a fixed schema.
+    Fields missing from the response become nulls, numeric fields that fail to parse become NaN.
+    """
+    df = pd.DataFrame.from_records(results, columns=schema.names)
+    for col in VIN_NUMERIC_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def ingest_to_parquet(json_path=file_path, parquet_path="vin_data.parquet", row_group_size=50000,
+                      schema=VIN_SCHEMA):
+    """
+    Streams the decoded batches of a scraper checkpoint file into a Parquet file.
+    Only one row group worth of records is held in memory at a time.
+
+    Parameters:
+    - json_path: checkpoint file written by src.vin_scraper
+    - parquet_path: output Parquet file
+    - row_group_size: number of rows buffered before a row group is written
+    - schema: Arrow schema of the output
+
+    Returns:
+    - number of rows written
+    """
+    rows = 0
+    buffer = []
+    with pq.ParquetWriter(parquet_path, schema, compression="snappy") as writer:
+        for batch in read_batches(json_path):
+            buffer.extend(batch.get("data", {}).get("Results", []))
+            if len(buffer) >= row_group_size:
+                writer.write_table(results_to_table(buffer, schema), row_group_size=row_group_size)
+                rows += len(buffer)
+                buffer = []
+        if buffer:
+            writer.write_table(results_to_table(buffer, schema), row_group_size=row_group_size)
+            rows += len(buffer)
+    return rows
+
+
+def read_vin_parquet(parquet_path="vin_data.parquet", columns=None):
+    """
+    Reads the ingested VIN table, loading only the requested columns.
+    """
+    return pq.read_table(parquet_path, columns=columns).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert scraped VIN batches into a Parquet table.")
+    parser.add_argument("--input", default=file_path)
+    parser.add_argument("--output", default="vin_data.parquet")
+    parser.add_argument("--row-group-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"Processing complete. {ingest_to_parquet(args.input, args.output, args.row_group_size)} rows written")
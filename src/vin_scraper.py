@@ -1,65 +1,187 @@
-import requests, json, os, shutil
-from time import sleep
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-backup_path = "vin_data_backup.json"
-file_path = "vin_data.json"
+import requests
+from requests.adapters import HTTPAdapter
 
-# Get vins data from NHTSA vehicle API
-def get_vin_data(vins_str, url="https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVINValuesBatch/"):
-    post_fields = {'format': 'json', 'data': vins_str}
-    r = requests.post(url, data=post_fields)
-    if r.status_code == 200:
-        return json.loads(r.text)  # Parse JSON response
-    else:
-        print(f"Error: {r.status_code}, {r.text}")
-        return {}
-
-
-#Create batches of 50 (max limitation of API)
-for idx, i in enumerate(range(0, len(vins), 50)):
-    end = i + 50
-    vins_str = ";".join(vins[i:end])
-    tmp = get_vin_data(vins_str=vins_str)
-    
-    with open(file_path, 'a') as file:  # Append mode
-        #Write the batch as a dictionary
-        json.dump({"batch_index": idx, "data": tmp}, file)
-        file.write(',\n')  # Add a comma and newline for separation
-
-    print(f"Batch from {str(i)} to {str(end)} successfully stored")
-    sleep(1)
-
-import pandas as pd
-import ijson
+BATCH_URL = "https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVINValuesBatch/"
+BATCH_SIZE = 50  # max limitation of API
 
 file_path = "vin_data.json"
 
-df = pd.DataFrame()
-
-
-batch_counter = 0
-
-# Stream the JSON file to process batch-by-batch
-with open(file_path, "r") as file:
-    for batch in ijson.items(file, "item"):
-        batch_counter += 1  
-        
-        
-        
-        # Extract "Results" key from the "data" dictionary
-        results = batch.get("data", {}).get("Results", [])
-        
-        # Debugging: Show the first few entries of "Results"
-        print(f"Results size: {len(results)}")
-        
-        # Convert the results list into a DataFrame
-        batch_df = pd.DataFrame(results)
-        
-        # Append the batch DataFrame to the main DataFrame
-        df = pd.concat([df, batch_df], ignore_index=True)
-
-        # Show the shape of the DataFrame
-        print(f"DataFrame shape after processing batch {batch_counter}: {df.shape}")
-
-print("Processing complete. Final DataFrame:")
-print(df.info())
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        Thread-safe token bucket rate limiter.
+
+        Parameters:
+        - rate: tokens added per second
+        - capacity: maximum burst size (defaults to rate)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available and consumes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchVinDecoder:
+    def __init__(self, url=BATCH_URL, batch_size=BATCH_SIZE, max_workers=8, rate=5.0,
+                 retries=4, backoff=1.0, timeout=30):
+        """
+        Concurrent client for the NHTSA DecodeVINValuesBatch endpoint.
+
+        Parameters:
+        - url: batch decode endpoint (point it at a local stub server for tests)
+        - batch_size: VINs per request
+        - max_workers: number of requests in flight
+        - rate: maximum requests started per second
+        - retries: attempts per batch after the first failure
+        - backoff: base delay in seconds, doubled on every retry
+        - timeout: per-request timeout in seconds
+        """
+        self.url = url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def batches(self, vins):
+        for idx, i in enumerate(range(0, len(vins), self.batch_size)):
+            yield idx, vins[i:i + self.batch_size]
+
+    def decode_batch(self, vins):
+        """
+        Decodes one batch of VINs, retrying with exponential backoff.
+
+        Returns:
+        - parsed JSON response
+        """
+        post_fields = {'format': 'json', 'data': ";".join(vins)}
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                r = self.session.post(self.url, data=post_fields, timeout=self.timeout)
+                if r.status_code == 200:
+                    return r.json()
+                error = f"{r.status_code}, {r.text[:200]}"
+            except (requests.RequestException, ValueError) as e:
+                error = str(e)
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise RuntimeError(f"Batch of {len(vins)} VINs failed after {self.retries + 1} attempts: {error}")
+
+    def run(self, vins, output_path=file_path):
+        """
+        Decodes all VINs concurrently, appending each finished batch to output_path.
+        Batches already present in output_path are skipped, so a crashed run can be resumed
+        by calling run again with the same VIN list.
+
+        Parameters:
+        - vins: list of VIN strings (the order defines batch indices)
+        - output_path: checkpoint file, one '{"batch_index": ..., "data": ...},' entry per line
+
+        Returns:
+        - list of batch indices that failed
+        """
+        done = completed_batches(output_path)
+        pending = [(idx, batch) for idx, batch in self.batches(vins) if idx not in done]
+        print(f"{len(done)} batches already stored, {len(pending)} to go")
+
+        failed = []
+        write_lock = threading.Lock()
+        with open(output_path, 'a') as file, ThreadPoolExecutor(self.max_workers) as pool:
+            futures = {pool.submit(self.decode_batch, batch): idx for idx, batch in pending}
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    data = future.result()
+                except RuntimeError as e:
+                    print(f"Batch {idx}: {e}")
+                    failed.append(idx)
+                    continue
+                with write_lock:
+                    json.dump({"batch_index": idx, "data": data}, file)
+                    file.write(',\n')
+                    file.flush()
+                print(f"Batch {idx} successfully stored")
+        return sorted(failed)
+
+
+def read_batches(path):
+    """
+    Yields the batch entries stored in a checkpoint file. A trailing, partially
+    written line left by a crash is ignored.
+    """
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip().rstrip(",")
+            if line in ("", "[", "]"):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def completed_batches(path):
+    if not os.path.exists(path):
+        return set()
+    return {batch["batch_index"] for batch in read_batches(path)}
+
+
+def load_vin_json(path=file_path):
+    """
+    Collects the decoded "Results" of every stored batch into a single DataFrame.
+    For large files prefer src.vin_ingest.ingest_to_parquet, which keeps memory flat.
+    """
+    import pandas as pd
+
+    results = []
+    for batch in read_batches(path):
+        results.extend(batch.get("data", {}).get("Results", []))
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode listing VINs through the NHTSA batch API.")
+    parser.add_argument("listings", help="CSV with a Vin column, e.g. data/true_car_listings.csv")
+    parser.add_argument("--output", default=file_path)
+    parser.add_argument("--url", default=BATCH_URL)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    vins = pd.read_csv(args.listings, usecols=["Vin"])["Vin"].str.strip().str.upper().drop_duplicates().tolist()
+    decoder = BatchVinDecoder(url=args.url, max_workers=args.workers, rate=args.rate)
+    failed = decoder.run(vins, args.output)
+    print(f"Processing complete. Failed batches: {failed or 'none'}")
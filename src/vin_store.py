@@ -0,0 +1,184 @@
+import argparse
+import datetime
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.features import VIN_NUMERIC_COLS, prepare_vin_table, join_vin_attributes
+from src.vin_scraper import BatchVinDecoder, read_batches
+
+DEFAULT_STORE_PATH = os.path.join("data", "vin_store.parquet")
+
+
+def read_vin_source(path):
+    """
+    Reads decoded VIN records from a CSV table, a Parquet table or a scraper checkpoint file.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".json"):
+        results = [r for batch in read_batches(path) for r in batch.get("data", {}).get("Results", [])]
+        return pd.DataFrame(results)
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+class VinAttributeStore:
+    def __init__(self, table):
+        """
+        In-memory VIN attribute table, indexed by the normalized VIN. Numeric engine columns are
+        float64, every other attribute is a pandas categorical, so the ~20 distinct body classes,
+        plants, fuel types etc. are stored once instead of once per VIN.
+
+        Use VinAttributeStore.load to open a store file and VinAttributeStore.from_source to build one.
+
+        Parameters:
+        - table: output of src.features.prepare_vin_table
+        """
+        self.table = self._compact(table)
+
+    @staticmethod
+    def _compact(table):
+        table = table[~table.index.duplicated(keep="last")].sort_index()
+        for col in table.columns:
+            if col not in VIN_NUMERIC_COLS and not isinstance(table[col].dtype, pd.CategoricalDtype):
+                table[col] = table[col].astype("category")
+        return table
+
+    @classmethod
+    def from_source(cls, path):
+        """
+        Builds a store from decoded VIN records (see read_vin_source).
+        """
+        return cls(prepare_vin_table(read_vin_source(path)))
+
+    @classmethod
+    def load(cls, path=DEFAULT_STORE_PATH):
+        """
+        Opens a store file written by save. Any other supported source is converted on the fly.
+        """
+        if not path.endswith(".parquet"):
+            return cls.from_source(path)
+        table = pq.read_table(path).to_pandas()
+        if "ModelVIN" in table.columns:
+            table = table.set_index("VIN")
+        else:
+            # A plain ingested VIN table (src.vin_ingest), not a store file
+            table = prepare_vin_table(table)
+        return cls(table)
+
+    def save(self, path=DEFAULT_STORE_PATH, row_group_size=50000):
+        """
+        Writes the store as Parquet sorted by VIN, strings dictionary-encoded.
+        """
+        table = pa.Table.from_pandas(self.table.reset_index(), preserve_index=False)
+        pq.write_table(table, path, row_group_size=row_group_size, compression="snappy")
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, vin):
+        return vin.strip().upper() in self.table.index
+
+    def join(self, listings, reference_year=None):
+        """
+        Enriches a listings DataFrame with the stored attributes in one vectorized merge.
+
+        Parameters:
+        - listings: pandas DataFrame shaped like data/true_car_listings.csv
+        - reference_year: year NumOfYears is counted from when listings lack that column
+
+        Returns:
+        - (features DataFrame in FEATURES_ORDER, boolean mask of listings whose VIN was found)
+        """
+        features, found = join_vin_attributes(listings, self.table, reference_year)
+        # The model sees plain object columns, as it did at training time
+        for col in features.columns:
+            if isinstance(features[col].dtype, pd.CategoricalDtype):
+                features[col] = features[col].astype(object)
+        return features, found
+
+    def missing(self, vins):
+        """
+        Distinct normalized VINs that the store does not know, in first-seen order.
+        """
+        vins = pd.Series(vins, dtype=str).str.strip().str.upper().drop_duplicates()
+        return vins[~vins.isin(self.table.index)].tolist()
+
+    def update(self, vin_df):
+        """
+        Adds decoded VIN records (NHTSA "Results" shape); newer records replace stored ones.
+
+        Returns:
+        - number of VINs added or replaced
+        """
+        new = prepare_vin_table(vin_df)
+        table = pd.concat([self.table.astype({c: object for c in self.table.columns if c not in VIN_NUMERIC_COLS}),
+                           new])
+        self.table = self._compact(table)
+        return len(new)
+
+    def decode_missing(self, listings, decoder=None, checkpoint_path=None):
+        """
+        Sends only the VINs the store does not know to the batch decoder and stores the results.
+
+        Parameters:
+        - listings: DataFrame with a Vin column
+        - decoder: BatchVinDecoder (a default client when None)
+        - checkpoint_path: decoder checkpoint file; a temporary file when None, so batch indices
+          of an earlier run are never mistaken for these VINs
+
+        Returns:
+        - (number of VINs added, list of failed batch indices)
+        """
+        vins = self.missing(listings["Vin"])
+        if not vins:
+            return 0, []
+        decoder = decoder or BatchVinDecoder()
+        temporary = checkpoint_path is None
+        if temporary:
+            fd, checkpoint_path = tempfile.mkstemp(suffix=".json")
+            os.close(fd)
+        try:
+            failed = decoder.run(vins, checkpoint_path)
+            results = read_vin_source(checkpoint_path)
+            added = self.update(results) if len(results) else 0
+        finally:
+            if temporary:
+                os.remove(checkpoint_path)
+        return added, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the VIN attribute store and join listings against it.")
+    parser.add_argument("--source", default=None, help="decoded VINs (.csv, .parquet or scraper .json) to add")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--listings", default=None, help="listings CSV to enrich, e.g. data/true_car_listings.csv")
+    parser.add_argument("--output", default=None, help="where to write the enriched listings (CSV)")
+    parser.add_argument("--decode-missing", action="store_true", help="decode unknown VINs through the NHTSA batch API")
+    parser.add_argument("--reference-year", type=int, default=datetime.date.today().year)
+    args = parser.parse_args()
+
+    store = VinAttributeStore.load(args.store) if os.path.exists(args.store) else None
+    if args.source:
+        if store is None:
+            store = VinAttributeStore.from_source(args.source)
+        else:
+            store.update(read_vin_source(args.source))
+    if store is None:
+        parser.error(f"{args.store} does not exist, build it with --source")
+
+    if args.listings:
+        listings = pd.read_csv(args.listings)
+        if args.decode_missing:
+            added, failed = store.decode_missing(listings)
+            print(f"Decoded {added} new VINs, failed batches: {failed or 'none'}")
+        features, found = store.join(listings, args.reference_year)
+        print(f"{found.sum()} of {len(found)} listings matched, {len(store.missing(listings['Vin']))} VINs unknown")
+        if args.output:
+            features.to_csv(args.output, index=False)
+
+    store.save(args.store)
+    print(f"{len(store)} VINs stored in {args.store}")
@@ -1,10 +1,12 @@
 import requests
-import pandas as pd
 from time import sleep
 
+from src.instrumentation import stage
+
 def get_vin_data(vin: str, url: str = "https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVinValues/") -> dict:
     vin = vin.strip().upper()
-    r = requests.get(f"{url}{vin}?format=json", timeout=10)
+    with stage("vin_decode.nhtsa"):
+        r = requests.get(f"{url}{vin}?format=json", timeout=10)
     if r.status_code == 200:
         return r.json()  # Parse JSON response
         
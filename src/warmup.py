@@ -0,0 +1,144 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Throwaway car priced once after loading, so the first real request does not pay for lazy
+# imports, page faults of the memory-mapped trees or the first sklearn validation pass
+WARMUP_INPUT = {
+    "Year": 2016, "State": "", "Mileage": 30000, "NumOfYears": 5, "Model": "3",
+    "Vin": "WBA8E9G59GNT12345", "City": "", "Make": "BMW",
+}
+
+WARMUP_VIN_RESULT = {
+    "EngineCylinders": "6", "DisplacementL": "3.0", "DisplacementCI": "183.07123228419",
+    "DisplacementCC": "3000.0", "FuelTypePrimary": "Gasoline", "GVWR": "Class 1C: 4,001 - 5,000 lb (1,814 - 2,268 kg)",
+    "EngineHP": "300", "Doors": "4", "BodyClass": "Sedan/Saloon", "Model": "3-Series",
+    "PlantCountry": "GERMANY", "PlantCity": "MUNICH", "Manufacturer": "BMW OF NORTH AMERICA, LLC",
+    "VehicleType": "PASSENGER CAR", "VIN": "WBA8E9G59GNT12345",
+}
+
+# Modules app.py needs before the first page is drawn, and the ones it now loads in the background
+STARTUP_MODULES = ["streamlit", "src.features", "src.vin_cache", "src.instrumentation", "src.model_metadata",
+                   "src.vin_decoder", "src.warmup", "src.serving"]
+DEFERRED_MODULES = ["numpy", "pandas", "joblib", "sklearn.ensemble", "src.fast_predict", "src.intervals",
+                    "src.forest_export", "src.prediction_cache", "src.scenarios"]
+
+
+class ModelWarmer:
+    def __init__(self, load, warm=None, ready_file=None):
+        """
+        Loads the model in a background thread so the process can serve its first page at once.
+
+        Parameters:
+        - load: callable returning the loaded resources (model, predictor, ...)
+        - warm: callable run once on the loaded resources, e.g. a dummy prediction
+        - ready_file: file created when warm-up succeeded and removed on start, for
+          readiness probes that cannot talk to the app itself (e.g. `test -f` in Kubernetes)
+        """
+        self.load = load
+        self.warm = warm
+        self.ready_file = ready_file
+        self.result = None
+        self.error = None
+        self.timings = {}
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if self.ready_file and os.path.exists(self.ready_file):
+            os.remove(self.ready_file)
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            start = time.perf_counter()
+            self.result = self.load()
+            self.timings["load_seconds"] = time.perf_counter() - start
+            if self.warm is not None:
+                start = time.perf_counter()
+                self.warm(self.result)
+                self.timings["warm_seconds"] = time.perf_counter() - start
+            if self.ready_file:
+                with open(self.ready_file, "w") as file:
+                    file.write(f"{time.time()}\n")
+            print("Model ready: " + ", ".join(f"{k} {v:.3f}s" for k, v in self.timings.items()))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def state(self):
+        if self._thread is None:
+            return "cold"
+        if not self._done.is_set():
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    def wait(self, timeout=None):
+        """
+        Blocks until warm-up finished and returns the loaded resources.
+
+        Raises:
+        - TimeoutError if the model is still loading after timeout seconds
+        - the warm-up error if loading failed
+        """
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError("model is still loading")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _import_times(code):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    costs = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only the top of each import tree; nested modules are included in their parent's time
+        if not name.startswith("  "):
+            costs[name.strip()] = int(cumulative) / 1e6
+    return costs
+
+
+def import_cost(modules, top=10):
+    """
+    Measures the import time of modules in a fresh interpreter with `python -X importtime`.
+    Modules the interpreter loads at startup anyway are left out.
+
+    Returns:
+    - (total seconds, list of (module, cumulative seconds) of the top most expensive imports)
+    """
+    baseline = _import_times("pass")
+    costs = {name: seconds for name, seconds in _import_times("; ".join(f"import {m}" for m in modules)).items()
+             if name not in baseline}
+    ranked = sorted(costs.items(), key=lambda item: item[1], reverse=True)
+    return sum(costs.values()), ranked[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import cost of the app's startup path versus the deferred modules.")
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    for title, modules in [("startup", STARTUP_MODULES), ("deferred", DEFERRED_MODULES),
+                           ("eager (before lazy imports)", STARTUP_MODULES + DEFERRED_MODULES)]:
+        total, ranked = import_cost(modules, args.top)
+        print(f"{title}: {total:.3f}s")
+        for name, seconds in ranked:
+            print(f"    {name:<40} {seconds:.3f}s")
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import inspect
+import os
+import time
+
+import joblib
+import pandas as pd
+from scipy.stats import randint, uniform
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import RandomizedSearchCV, train_test_split
+from sklearn.metrics import mean_absolute_error
+from sklearn.pipeline import Pipeline
+
+from src.features import FEATURES_ORDER, COLS_TO_EXCLUDE
+from src.model_metadata import MODELS_DIR, MODEL_NAME, artifact_versions, write_metadata
+from src.prediction_cache import model_fingerprint
+from src.transformers import CustomTransformer
+
+DATA_PATH = os.path.join("data", "bmw_and_vin_data.csv")
+CACHE_DIR = os.path.join(MODELS_DIR, "cache")
+TEST_SIZE = 0.1  # holdout share used in the notebook
+
+# Hyperparameters of best_random_forest_v1, found with OptunaSearchCV in the notebook
+BEST_PARAMS = {"n_estimators": 305, "max_features": 0.400801096953862, "max_depth": 15}
+
+SEARCH_SPACE = {
+    "n_estimators": randint(100, 400),
+    "max_features": uniform(0.2, 0.6),
+    "max_depth": randint(8, 25),
+    "min_samples_leaf": randint(1, 5),
+}
+
+
+def data_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def load_training_data(path):
+    data = pd.read_csv(path)
+    data = data.loc[:, ~data.columns.str.startswith("Unnamed")]
+    if "NumOfYears" not in data.columns:
+        data["NumOfYears"] = 2018 - data["Year"]  # listings were scraped in 2018
+    data["Model"] = data["Model"].astype(str)
+    data = data.dropna(subset=["Price", "Mileage", "EngineHP", "EngineCylinders", "DisplacementL"])
+    return data[FEATURES_ORDER], data["Price"]
+
+
+def fit_features(path, test_size=TEST_SIZE, random_state=42, cache_dir=CACHE_DIR):
+    """
+    Splits the data, fits the CustomTransformer on the training part only and transforms both
+    parts, reusing a cached result when the data file, the split and the transformer code have
+    not changed.
+
+    Returns:
+    - (fitted transformer, X_train, X_test, y_train, y_test, data fingerprint)
+    """
+    fingerprint = data_fingerprint(path)
+    with open(inspect.getsourcefile(CustomTransformer), "rb") as file:
+        code = hashlib.sha256(file.read()).hexdigest()[:8]
+    cache_path = os.path.join(cache_dir, f"features-{fingerprint}-{code}-{test_size}-{random_state}.joblib")
+    if os.path.exists(cache_path):
+        print(f"Using cached features {cache_path}")
+        return (*joblib.load(cache_path), fingerprint)
+
+    X_raw, y = load_training_data(path)
+    X_train_raw, X_test_raw, y_train, y_test = train_test_split(X_raw, y, test_size=test_size,
+                                                                random_state=random_state)
+    # Fitted on the training rows only, so no one-hot category is learned from the holdout
+    transformer = CustomTransformer(vin_nonNumeric_cols=COLS_TO_EXCLUDE).fit(X_train_raw)
+    result = (transformer, transformer.transform(X_train_raw), transformer.transform(X_test_raw), y_train, y_test)
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump(result, cache_path)
+    return (*result, fingerprint)
+
+
+def next_artifact_path(models_dir=MODELS_DIR, name=MODEL_NAME):
+    return os.path.join(models_dir, f"{name}_v{max(artifact_versions(models_dir, name), default=0) + 1}.joblib")
+
+
+def train(data_path=DATA_PATH, output=None, search_iter=0, n_jobs=-1, warm_start_from=None, add_trees=50,
+          random_state=42):
+    """
+    Trains the price pipeline and writes a versioned artifact plus metadata.
+
+    Parameters:
+    - data_path: joined listings and VIN data
+    - output: artifact path (default: next models/best_random_forest_vN.joblib)
+    - search_iter: randomized search iterations (0 reuses BEST_PARAMS)
+    - n_jobs: cores used by the search and the forest
+    - warm_start_from: existing artifact whose forest is extended instead of retrained
+    - add_trees: trees added when warm starting
+    """
+    start = time.perf_counter()
+    if warm_start_from:
+        # Keep the fitted transformer so the new trees see the same feature columns as the old ones.
+        # The rows the original trees were trained on are unknown, so there is no unseen holdout:
+        # the new trees use all rows and no test MAE is reported.
+        base = joblib.load(warm_start_from)
+        transformer, forest = base.steps[0][1], base.steps[-1][1]
+        X_raw, y = load_training_data(data_path)
+        fingerprint = data_fingerprint(data_path)
+        forest.set_params(warm_start=True, n_estimators=forest.n_estimators + add_trees, n_jobs=n_jobs)
+        forest.fit(transformer.transform(X_raw), y)
+        params = forest.get_params()
+        mae = None
+        holdout_rows = None
+    else:
+        transformer, X_train, X_test, y_train, y_test, fingerprint = fit_features(data_path,
+                                                                                   random_state=random_state)
+        if search_iter:
+            search = RandomizedSearchCV(RandomForestRegressor(random_state=random_state), SEARCH_SPACE,
+                                        n_iter=search_iter, cv=3, scoring="neg_mean_absolute_error",
+                                        n_jobs=n_jobs, random_state=random_state, verbose=1)
+            search.fit(X_train, y_train)
+            forest = search.best_estimator_
+            params = search.best_params_
+        else:
+            forest = RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **BEST_PARAMS)
+            forest.fit(X_train, y_train)
+            params = BEST_PARAMS
+        mae = round(float(mean_absolute_error(y_test, forest.predict(X_test))), 2)
+        holdout_rows = sorted(int(i) for i in y_test.index)
+
+    forest.set_params(n_jobs=None, warm_start=False)  # serve single-threaded, as the notebook model did
+    pipeline = Pipeline([("custom_transform", transformer), ("rf", forest)])
+
+    output = output or next_artifact_path()
+    joblib.dump(pipeline, output)
+    meta = write_metadata(
+        output, pipeline, FEATURES_ORDER,
+        data_path=data_path,
+        data_fingerprint=fingerprint,
+        artifact_fingerprint=model_fingerprint(output),
+        training_seconds=round(time.perf_counter() - start, 1),
+        trained_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        hyperparameters={k: v for k, v in params.items() if isinstance(v, (int, float, str, bool, type(None)))},
+        n_estimators=forest.n_estimators,
+        test_mae=mae,
+        warm_started_from=warm_start_from,
+        # Rows of data_path (CSV row numbers) never used for training; distill.py evaluates on them
+        holdout_rows=holdout_rows,
+    )
+    quality = "no unseen holdout" if mae is None else f"test MAE ${mae:,.0f}"
+    print(f"Saved {output} ({quality}, {meta['training_seconds']}s)")
+    return output, meta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the BMW price model and write a versioned artifact.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--search-iter", type=int, default=0, help="randomized search iterations (0: notebook params)")
+    parser.add_argument("--jobs", type=int, default=-1)
+    parser.add_argument("--warm-start-from", default=None, help="artifact whose forest gets extra trees")
+    parser.add_argument("--add-trees", type=int, default=50)
+    args = parser.parse_args()
+
+    train(args.data, args.output, args.search_iter, args.jobs, args.warm_start_from, args.add_trees)